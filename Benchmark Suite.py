@@ -0,0 +1,230 @@
+"""
+BENCHMARK SUITE
+
+Times the scripts in this folder on workloads of growing size and records the
+time and peak memory of each run. The scripts have spaces in their names (and
+The One Address Machine has no .py extension), so they are loaded by path.
+
+Every run is appended to a JSON history. With a stored baseline, the run fails
+(exit status 1) when a workload gets slower or uses more memory than the
+baseline allows:
+
+    python "Benchmark Suite.py" --save-baseline      # record the baseline
+    python "Benchmark Suite.py"                      # compare against it
+    python "Benchmark Suite.py" --quick --only quicksort knapsack
+"""
+
+import argparse
+import importlib.machinery
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HISTORY = os.path.join(HERE, "benchmark_history.json")
+BASELINE = os.path.join(HERE, "benchmark_baseline.json")
+
+# The scripts under test, by short name.
+MODULES = {
+    "oam": "The One Address Machine",
+    "search": "Search Algorithms.py",
+    "useful": "Useful Functions.py",
+    "wordle": "Simple Worlde Game.py",
+    "shopping": "Shopping List Generator.py",
+}
+LOADED = {}
+
+
+# load(name) imports one of the MODULES from its file path, once. The
+# module is registered in sys.modules so worker processes can unpickle
+# its functions.
+def load(name):
+    if name not in LOADED:
+        loader = importlib.machinery.SourceFileLoader(name, os.path.join(HERE, MODULES[name]))
+        module = importlib.util.module_from_spec(importlib.util.spec_from_loader(name, loader))
+        sys.modules[name] = module
+        loader.exec_module(module)
+        LOADED[name] = module
+    return LOADED[name]
+
+
+# Workload builders. Each takes a size and returns a function that runs
+# the workload once; building the input data happens outside the timing.
+def oam_loop(mode):
+    def build(n):
+        oam = load("oam")
+        source = oam.LOOP_PROGRAM.format(n=n)
+
+        def run():
+            machine = oam.OAM()
+            machine.assembly_code = source
+            machine.load()
+            getattr(machine, mode)()
+        return run
+    return build
+
+def random_graph(n, rng):
+    return {v: {rng.randrange(n) for _ in range(4)} for v in range(n)}
+
+def graph_search(function):
+    def build(n):
+        search = load("search")
+        graph = random_graph(n, random.Random(n))
+        return lambda: getattr(search, function)(graph, 0)
+    return build
+
+def quicksort(n):
+    search = load("search")
+    rng = random.Random(n)
+    data = [rng.randrange(n) for _ in range(n)]
+    return lambda: search.quicksort(data)
+
+def find_primes(n):
+    useful = load("useful")
+    return lambda: useful.findPrimeNumbers(n)
+
+def knapsack(n):
+    useful = load("useful")
+    rng = random.Random(n)
+    weights = [rng.randint(1, 100) for _ in range(100)]
+    values = [rng.randint(1, 1000) for _ in range(100)]
+    return lambda: useful.knapsack(weights, values, n)
+
+def levenshtein(n):
+    useful = load("useful")
+    rng = random.Random(n)
+    s1 = "".join(rng.choice("acgt") for _ in range(n))
+    s2 = "".join(rng.choice("acgt") for _ in range(n))
+    return lambda: useful.levenshteinDistance(s1, s2)
+
+def eval_guess(n):
+    wordle = load("wordle")
+    rng = random.Random(n)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(5)) for _ in range(n)]
+    guess = words[0]
+    return lambda: [wordle.evalGuess(guess, target) for target in words]
+
+def parse_input(n):
+    shopping = load("shopping")
+    rng = random.Random(n)
+    text = ", ".join("item{} {}".format(rng.randrange(1000), rng.randrange(1, 10)) for _ in range(n))
+    generator = shopping.ShoppingListGenerator()
+    return lambda: list(generator.parse_input(text))
+
+# The workloads: name -> (builder, sizes). --quick runs the first two
+# sizes of each.
+WORKLOADS = {
+    "oam_run": (oam_loop("run"), [1000, 5000, 20000]),
+    "oam_run_fast": (oam_loop("run_fast"), [1000, 10000, 100000]),
+    "oam_run_compiled": (oam_loop("run_compiled"), [1000, 10000, 100000]),
+    "bfs": (graph_search("bfs"), [1000, 10000, 100000]),
+    "dfs": (graph_search("depthFirstSearch"), [1000, 10000, 100000]),
+    "quicksort": (quicksort, [1000, 10000, 100000]),
+    "find_primes": (find_primes, [10000, 100000, 1000000]),
+    "knapsack": (knapsack, [1000, 10000, 100000]),
+    "levenshtein": (levenshtein, [100, 500, 2000]),
+    "eval_guess": (eval_guess, [1000, 10000, 100000]),
+    "parse_input": (parse_input, [1000, 10000, 100000]),
+}
+
+
+# measure(run, repeat) returns the best wall time over repeat runs and the
+# peak traced memory of one more run (traced separately, since tracing
+# slows the code down).
+def measure(run, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+# run_suite(names, quick, repeat) runs the selected workloads at each of
+# their sizes and returns {"workload[size]": measurement}.
+def run_suite(names=None, quick=False, repeat=3):
+    results = {}
+    for name, (build, sizes) in WORKLOADS.items():
+        if names and name not in names:
+            continue
+        for size in sizes[:2] if quick else sizes:
+            key = "{}[{}]".format(name, size)
+            results[key] = measure(build(size), repeat)
+            print("{:<28}{:>12.6f} s {:>12.1f} KiB".format(
+                key, results[key]["seconds"], results[key]["peak_bytes"] / 1024))
+    return results
+
+# record(results, path) appends a run to the JSON history file.
+def record(results, path=HISTORY):
+    history = []
+    if os.path.exists(path):
+        with open(path) as infile:
+            history = json.load(infile)
+    history.append({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                    "machine": platform.machine(), "results": results})
+    with open(path, "w") as outfile:
+        json.dump(history, outfile, indent=2)
+
+# compare(results, baseline, tolerance, memory_tolerance) returns a list of
+# regressions: workloads whose time grew by more than tolerance, or whose
+# peak memory grew by more than memory_tolerance, relative to the baseline.
+# Slowdowns smaller than NOISE_SECONDS are ignored, and workloads missing
+# from either side are skipped.
+NOISE_SECONDS = 0.001
+def compare(results, baseline, tolerance=0.25, memory_tolerance=0.10):
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current["seconds"] - previous["seconds"] < NOISE_SECONDS:
+            current = dict(current, seconds=previous["seconds"])
+        for field, allowed in (("seconds", tolerance), ("peak_bytes", memory_tolerance)):
+            if previous[field] and current[field] > previous[field] * (1 + allowed):
+                regressions.append("{} {}: {:.6g} -> {:.6g} (+{:.0%}, allowed +{:.0%})".format(
+                    key, field, previous[field], current[field], current[field] / previous[field] - 1, allowed))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scripts in this folder.")
+    parser.add_argument("--only", nargs="+", choices=sorted(WORKLOADS), help="workloads to run")
+    parser.add_argument("--quick", action="store_true", help="run only the smaller sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per workload (best is kept)")
+    parser.add_argument("--history", default=HISTORY, help="JSON file the run is appended to")
+    parser.add_argument("--baseline", default=BASELINE, help="JSON file of baseline results")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10, help="allowed memory growth")
+    args = parser.parse_args()
+
+    results = run_suite(args.only, args.quick, args.repeat)
+    record(results, args.history)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as infile:
+                baseline = json.load(infile)
+        baseline.update(results)
+        with open(args.baseline, "w") as outfile:
+            json.dump(baseline, outfile, indent=2)
+        print("Baseline saved to " + args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as infile:
+            regressions = compare(results, json.load(infile), args.tolerance, args.memory_tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("\nNo regressions against " + args.baseline)
@@ -1,5 +1,6 @@
 import databento as db
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
@@ -8,6 +9,13 @@ from sklearn.metrics import mean_squared_error, r2_score
 import matplotlib.pyplot as plt
 import warnings
 import time
+import json
+import os
+import argparse
+import tracemalloc
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 """
 ML STOCK PREDICTION PROGRAM
@@ -29,8 +37,14 @@ data until it meets or exceeds an accuracy threshold determined by a user-config
 CHOSEN_DATASET = "XNAS.ITCH"  # dataset to fetch from
 NUM_DAYS = 30  # number of days of training data
 ACCURACY_THRESHOLD = 0.8  # the minimum acceptable R squared value
+MAX_DAYS = 365  # the longest training period to try
+WINDOW_STEP = 10  # number of days added to the training period on each try
 IGNORE_WARNINGS = True  # show or hide warnings
 DEFAULT_API_KEY = ""  # default api key to use for fetching data
+CACHE_DIR = "databento_cache"  # local store for fetched data, or None to always download
+RANGE_TTL = 3600  # seconds to reuse a dataset's available date range before asking again
+BATCH_SYMBOLS = 500  # number of symbols fetched per request in batch mode
+AUTH_STATUSES = (401, 403)  # http statuses the API answers a bad or unauthorized key with
 
 if IGNORE_WARNINGS:
     warnings.filterwarnings("ignore", category=db.common.error.BentoWarning)
@@ -47,33 +61,193 @@ def input_handler(prompt):
 def create_client(api_key):
     return db.Historical(api_key)
 
-# checks whether symbol is valid and creates datafram for stock data
+# offline stand-in for db.Historical with the parts of its interface this program uses:
+# metadata.get_dataset_range(dataset=...) and timeseries.get_range(...).to_df(). records are replayed from a
+# directory of per-symbol files (SYMBOL.dbn, SYMBOL.dbn.zst, SYMBOL.parquet or SYMBOL.csv, indexed by ts_event),
+# or, with no directory, generated as a random walk for any symbol. generated prices only depend on the symbol,
+# seed and date, so overlapping requests agree with each other. like the live API, a request for several symbols
+# returns the ones that have data and warns about the rest; it only fails when none of them has any.
+class ReplayClient:
+    def __init__(self, directory=None, end_date="2023-06-30", history_days=5 * 365, seed=0):
+        self.directory = directory
+        self.end_date = end_date
+        self.start_date = (datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=history_days)).strftime("%Y-%m-%d")
+        self.seed = seed
+        self.frames = {}  # symbol -> all of its records
+        self.metadata = self
+        self.timeseries = self
+
+    def get_dataset_range(self, dataset):
+        return {"start_date": self.start_date, "end_date": self.end_date}
+
+    def get_range(self, dataset, start, end, symbols, stype_in="raw_symbol", schema="ohlcv-1d"):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        lower, upper = pd.Timestamp(start, tz="UTC"), pd.Timestamp(end, tz="UTC")
+        frames, missing = [], []
+        for symbol in symbols:
+            try:
+                frames.append(self.records(symbol))
+            except ValueError:
+                missing.append(symbol)
+        if not frames:
+            raise ValueError(f"No replay data for symbols {', '.join(missing)}")
+        if missing:
+            warnings.warn(f"No replay data for symbols {', '.join(missing)}", db.common.error.BentoWarning)
+        data = pd.concat([frame[(frame.index >= lower) & (frame.index < upper)] for frame in frames])
+        return ReplayData(data.sort_index(kind="stable"))
+
+    # all the records of one symbol, loaded or generated on first use
+    def records(self, symbol):
+        if symbol not in self.frames:
+            self.frames[symbol] = self.load(symbol) if self.directory is not None else self.generate(symbol)
+        return self.frames[symbol]
+
+    def load(self, symbol):
+        base = os.path.join(self.directory, symbol)
+        if os.path.exists(base + ".dbn") or os.path.exists(base + ".dbn.zst"):
+            path = base + ".dbn" if os.path.exists(base + ".dbn") else base + ".dbn.zst"
+            data = db.DBNStore.from_file(path).to_df()
+        elif os.path.exists(base + ".parquet"):
+            data = pd.read_parquet(base + ".parquet")
+        elif os.path.exists(base + ".csv"):
+            data = pd.read_csv(base + ".csv", index_col="ts_event")
+        else:
+            raise ValueError(f"No replay data for symbol {symbol}")
+        data.index = pd.to_datetime(data.index, utc=True)
+        if "symbol" not in data.columns:
+            data["symbol"] = symbol
+        return data
+
+    def generate(self, symbol):
+        index = pd.date_range(self.start_date, self.end_date, freq="B", inclusive="left", tz="UTC", name="ts_event")
+        rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index)))) + 10
+        open = np.concatenate([[close[0]], close[:-1]]) * np.exp(rng.normal(0, 0.005, len(index)))
+        high = np.maximum(open, close) * np.exp(np.abs(rng.normal(0, 0.01, len(index))))
+        low = np.minimum(open, close) * np.exp(-np.abs(rng.normal(0, 0.01, len(index))))
+        return pd.DataFrame({
+            "rtype": 35,
+            "publisher_id": 2,
+            "instrument_id": zlib.crc32(symbol.encode()) % 100000,
+            "open": open,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": rng.integers(100000, 5000000, len(index)).astype("uint64"),
+            "symbol": symbol,
+        }, index=index)
+
+# the result of a ReplayClient request
+class ReplayData:
+    def __init__(self, data):
+        self.data = data
+
+    def to_df(self, map_symbols=True):
+        return self.data.copy()
+
+# checks whether symbol is valid and creates datafram for stock data. only a rejected symbol is reported here;
+# an authentication error (and anything else unexpected) is raised, so main() can ask for another api key
 def check_symbol(client, symbol, num_days):
     end_date = get_dataset_range(client, CHOSEN_DATASET)
     start_date = end_date - timedelta(days=num_days)
 
     try:
-        data = client.timeseries.get_range(
-            dataset=CHOSEN_DATASET,
-            start=start_date.strftime("%Y-%m-%d"),
-            end=end_date.strftime("%Y-%m-%d"),
-            symbols=symbol,
-            stype_in="raw_symbol",
-            schema="ohlcv-1d",
-        ).to_df()
+        data = get_cached_range(client, CHOSEN_DATASET, symbol, "ohlcv-1d", start_date, end_date)
         return data
-    except:
-        print("Could not find symbol.")
-        return None
+    except db.common.error.BentoClientError as e:
+        if e.http_status in AUTH_STATUSES:
+            raise
+    except ValueError:  # ReplayClient has no data for the symbol
+        pass
+    print("Could not find symbol.")
+    return None
+
+# downloads one date range of records for a symbol (or a list of symbols) from the Databento API. the records'
+# instrument ids are mapped back to the requested raw symbols in a "symbol" column
+def download_range(client, dataset, symbol, schema, start, end):
+    return client.timeseries.get_range(
+        dataset=dataset,
+        start=start.strftime("%Y-%m-%d"),
+        end=end.strftime("%Y-%m-%d"),
+        symbols=symbol,
+        stype_in="raw_symbol",
+        schema=schema,
+    ).to_df(map_symbols=True)
+
+# gets the paths of the local store for a (dataset, symbol, schema): a parquet file with the records and a
+# json file with the date range they cover
+def cache_paths(dataset, symbol, schema):
+    name = "_".join(part.replace(".", "-").replace("/", "-") for part in (dataset, symbol, schema))
+    base = os.path.join(CACHE_DIR, name)
+    return base + ".parquet", base + ".json"
+
+# gets records for [start, end) from the local store, downloading only the dates the store does not cover
+# yet and adding them to it. the client can be any object with the same timeseries.get_range(...).to_df()
+# interface as db.Historical, such as a stub for offline use.
+def get_cached_range(client, dataset, symbol, schema, start, end):
+    if CACHE_DIR is None:
+        return download_range(client, dataset, symbol, schema, start, end)
+
+    data_path, range_path = cache_paths(dataset, symbol, schema)
+    data, covered = None, None
+    if os.path.exists(data_path) and os.path.exists(range_path):
+        data = pd.read_parquet(data_path)
+        with open(range_path) as infile:
+            covered = json.load(infile)
+        covered = (datetime.strptime(covered["start"], "%Y-%m-%d"), datetime.strptime(covered["end"], "%Y-%m-%d"))
+
+    # works out the gaps on either side of the covered range
+    if covered is None:
+        gaps = [(start, end)]
+    else:
+        gaps = []
+        if start < covered[0]:
+            gaps.append((start, covered[0]))
+        if end > covered[1]:
+            gaps.append((covered[1], end))
+
+    if gaps:
+        frames = [data] if data is not None else []
+        frames += [download_range(client, dataset, symbol, schema, gap_start, gap_end) for gap_start, gap_end in gaps]
+        data = pd.concat(frames)
+        data = data[~data.index.duplicated(keep="last")].sort_index()
+        covered = (min(start, covered[0]), max(end, covered[1])) if covered else (start, end)
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        data.to_parquet(data_path)
+        with open(range_path, "w") as outfile:
+            json.dump({"start": covered[0].strftime("%Y-%m-%d"), "end": covered[1].strftime("%Y-%m-%d")}, outfile)
+
+    # records are indexed by their UTC event timestamp
+    lower = pd.Timestamp(start.strftime("%Y-%m-%d"), tz="UTC")
+    upper = pd.Timestamp(end.strftime("%Y-%m-%d"), tz="UTC")
+    return data[(data.index >= lower) & (data.index < upper)]
 
 # fetches data from the Databento API
 def fetch_data(data):
     return data
 
-# gets the available date range for the chosen dataset
+# gets the available date range for the chosen dataset. the answer is memoized, in memory and in the local
+# store, and reused for RANGE_TTL seconds
+dataset_ranges = {}
+
 def get_dataset_range(client, dataset):
-    available_range = client.metadata.get_dataset_range(dataset=dataset)
-    end = available_range["end_date"]
+    ranges_path = os.path.join(CACHE_DIR, "dataset_ranges.json") if CACHE_DIR is not None else None
+    if dataset not in dataset_ranges and ranges_path is not None and os.path.exists(ranges_path):
+        with open(ranges_path) as infile:
+            dataset_ranges.update(json.load(infile))
+
+    cached = dataset_ranges.get(dataset)
+    if cached is not None and time.time() - cached[0] < RANGE_TTL:
+        end = cached[1]
+    else:
+        available_range = client.metadata.get_dataset_range(dataset=dataset)
+        end = available_range["end_date"]
+        dataset_ranges[dataset] = [time.time(), end]
+        if ranges_path is not None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(ranges_path, "w") as outfile:
+                json.dump(dataset_ranges, outfile)
     return datetime.strptime(end, "%Y-%m-%d")
 
 # prepares the dataframe by adding required columns and calculations
@@ -101,6 +275,104 @@ def prepare_dataframe(df):
         "vwap": df["vwap"],
     })
 
+# computes the same features as prepare_dataframe() incrementally, for bars that arrive one at a time. vwap comes
+# from running sums of price * volume and volume, and rsi from a fixed-size ring of the last RSI_WINDOW up/down
+# moves, so each new bar costs O(1). backfill() adds many bars at once with vectorized numpy code, and can be
+# mixed freely with update(). the features of every bar are kept in numpy arrays that grow by doubling, and
+# to_frame() returns them as the dataframe prepare_dataframe() would have built. functions added with add_hook()
+# are called with the features of every new bar, e.g. prediction_hook() to refresh a trained model's prediction.
+RSI_WINDOW = 5
+
+class IndicatorEngine:
+    COLUMNS = ["open", "high", "low", "close", "volume", "rsi", "vwap"]
+
+    def __init__(self, capacity=1024):
+        self.pv_sum = 0.0
+        self.volume_sum = 0.0
+        self.moves = deque(maxlen=RSI_WINDOW)  # (up, down) of the latest bars
+        self.hooks = []
+        self.size = 0
+        self.index = []
+        self.values = np.empty((capacity, len(self.COLUMNS)))
+
+    # adds one bar and returns its features as a dictionary
+    def update(self, open, high, low, close, volume, timestamp=None):
+        open, high, low, close, volume = float(open), float(high), float(low), float(close), float(volume)
+        self.pv_sum += (open + high + close) / 3 * volume
+        self.volume_sum += volume
+        vwap = self.pv_sum / self.volume_sum if self.volume_sum else np.nan
+
+        self.moves.append((max(close - open, 0.0), max(open - close, 0.0)))
+        rsi = np.nan
+        if len(self.moves) == RSI_WINDOW:
+            up = sum(move[0] for move in self.moves) / RSI_WINDOW
+            down = sum(move[1] for move in self.moves) / RSI_WINDOW
+            if down:
+                rsi = 100 - (100 / (1 + up / down))
+            elif up:
+                rsi = 100.0
+
+        row = dict(zip(self.COLUMNS, (open, high, low, close, volume, rsi, vwap)))
+        self.store(np.array([list(row.values())]), [timestamp])
+        for hook in self.hooks:
+            hook(row)
+        return row
+
+    # adds every bar of a dataframe with open, high, low, close and volume columns at once
+    def backfill(self, df):
+        if len(df) == 0:
+            return
+        bars = df[["open", "high", "close", "low", "volume"]].to_numpy(dtype=float)
+        open, high, close, low, volume = bars.T
+        pv = np.cumsum((open + high + close) / 3 * volume)
+        vol = np.cumsum(volume)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vwap = (self.pv_sum + pv) / (self.volume_sum + vol)
+
+            # the rsi windows reach back into the bars already in the ring
+            moves = np.array(list(self.moves) + list(zip(np.clip(close - open, 0, None), np.clip(open - close, 0, None))))
+            rsi = np.full(len(df), np.nan)
+            if len(moves) >= RSI_WINDOW:
+                windows = np.lib.stride_tricks.sliding_window_view(moves, RSI_WINDOW, axis=0).sum(axis=2) / RSI_WINDOW
+                rs = windows[:, 0] / windows[:, 1]
+                tail = min(len(df), len(windows))
+                rsi[len(df) - tail:] = (100 - (100 / (1 + rs)))[len(windows) - tail:]
+
+        self.pv_sum += pv[-1]
+        self.volume_sum += vol[-1]
+        self.moves.extend(map(tuple, moves[-RSI_WINDOW:]))
+        values = np.column_stack([open, high, low, close, volume, rsi, vwap])
+        self.store(values, list(df.index))
+        for hook in self.hooks:
+            hook(dict(zip(self.COLUMNS, values[-1])))
+
+    # appends rows of features, growing the arrays when they are full
+    def store(self, values, index):
+        while self.size + len(values) > len(self.values):
+            self.values = np.concatenate([self.values, np.empty_like(self.values)])
+        self.values[self.size:self.size + len(values)] = values
+        self.size += len(values)
+        self.index += index
+
+    # returns the features of every bar so far as a dataframe
+    def to_frame(self):
+        return pd.DataFrame(self.values[:self.size], columns=self.COLUMNS, index=self.index)
+
+    # registers a function to call with the features of each new bar (the last one, for backfill())
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+# makes an IndicatorEngine hook that predicts the next close with a trained linear model whenever a bar arrives,
+# and passes the bar's features and the prediction to callback. bars without an rsi yet are skipped.
+def prediction_hook(model, callback):
+    features = ["open", "high", "low", "volume", "vwap", "rsi"]
+
+    def hook(row):
+        x = np.array([row[feature] for feature in features])
+        if np.isfinite(x).all():
+            callback(row, float(np.dot(model.coef_, x) + model.intercept_))
+    return hook
+
 # splits the dataframe into training and test sets, performs imputation to fill missing values
 def get_train_test(df):
     X = df[["open", "high", "low", "volume", "vwap", "rsi"]]
@@ -125,6 +397,56 @@ def get_model(X_train, y_train):
 def get_prediction(model, X_test):
     return model.predict(X_test)
 
+# scores every training window length in windows (in days, counted back from end_date) in one pass over
+# data, which must cover the longest of them. features are computed once over the whole of data, every
+# fifth row counting back from the most recent is held out for testing, and missing values are filled with
+# the column means of data. prefix sums of the per-row Gram matrices (X^T X, X^T y) then give the training
+# and test sums of any window by subtraction, so all the windows' regressions are solved at once. returns
+# the smallest window whose R squared meets threshold (or None) and the R squared curve as a dataframe.
+def search_windows(data, end_date, windows, threshold=ACCURACY_THRESHOLD):
+    df = prepare_dataframe(data.copy())
+    X = df[["open", "high", "low", "volume", "vwap", "rsi"]].to_numpy(dtype=float)
+    y = df["close"].to_numpy(dtype=float)
+
+    # imputation, then standardization (which leaves a linear fit's predictions unchanged) for stability
+    X[~np.isfinite(X)] = np.nan
+    means = np.nanmean(X, axis=0)
+    X = np.where(np.isnan(X), means, X)
+    scale = X.std(axis=0)
+    X = (X - X.mean(axis=0)) / np.where(scale > 0, scale, 1)
+    X = np.hstack([np.ones((len(X), 1)), X])
+    y = y - y.mean()
+
+    # prefix sums of the Gram matrices, separately for training and test rows
+    n, p = X.shape
+    test = (n - 1 - np.arange(n)) % 5 == 0
+    rows = np.stack([test, ~test])[:, :, None]
+    gram = np.concatenate([np.zeros((2, 1, p, p)), np.cumsum(rows[..., None] * np.einsum("ij,ik->ijk", X, X), axis=1)], axis=1)
+    moment = np.concatenate([np.zeros((2, 1, p)), np.cumsum(rows * X * y[:, None], axis=1)], axis=1)
+    sums = np.concatenate([np.zeros((2, 1, 3)), np.cumsum(rows * np.stack([np.ones(n), y, y * y], axis=1), axis=1)], axis=1)
+
+    # the first row of each window, and the window sums by subtraction from the totals
+    windows = np.asarray(list(windows))
+    starts = [pd.Timestamp(end_date - timedelta(days=int(days))).strftime("%Y-%m-%d") for days in windows]
+    index = df.index.tz_localize(None) if getattr(df.index, "tz", None) is not None else df.index
+    first = np.searchsorted(index, pd.to_datetime(starts))
+    G = gram[:, -1][:, None] - gram[:, first]
+    b = moment[:, -1][:, None] - moment[:, first]
+    count, y_sum, yy_sum = np.moveaxis(sums[:, -1][:, None] - sums[:, first], -1, 0)
+
+    # least squares fit on the training rows, scored on the test rows
+    beta = np.einsum("kij,kj->ki", np.linalg.pinv(G[1]), b[1])
+    sse = yy_sum[0] - 2 * np.einsum("ki,ki->k", beta, b[0]) + np.einsum("ki,kij,kj->k", beta, G[0], beta)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sst = yy_sum[0] - y_sum[0] ** 2 / count[0]
+        r2 = np.where((count[0] >= 2) & (count[1] >= p), 1 - sse / sst, np.nan)
+        mse = np.where(count[0] > 0, sse / count[0], np.nan)
+
+    curve = pd.DataFrame({"days": windows, "rows": n - first, "r2": r2, "mse": mse})
+    satisfactory = curve[curve["r2"] >= threshold]
+    best = int(satisfactory["days"].iloc[0]) if len(satisfactory) else None
+    return best, curve
+
 # prepares the data for plotting
 def get_stock_data_to_plot(df, X_test, y_test, y_pred):
     df_test = pd.DataFrame(X_test[-14:], columns=df.columns.drop('close'), index=X_test.index[-14:])
@@ -173,23 +495,153 @@ def fetch_and_train_model(client, symbol, dataset, num_days, data):
 
     return df_test, r2, mse, num_days, satisfactory
 
-def main(num_days=NUM_DAYS):    
+# splits a dataframe holding several symbols' records into one dataframe per symbol, keyed by the symbology-mapped
+# symbol (instrument ids can change over time, and several can map to one symbol). records that could not be mapped
+# to a symbol are left out
+def split_by_symbol(data):
+    if "symbol" not in data.columns:
+        return {}
+    return {str(name): frame for name, frame in data.groupby("symbol")}
+
+# trains and scores the model for one (symbol, data) pair and returns its test set predictions as a table, or
+# a single row with the error. it runs in worker processes for batch_predict(), so it never prints, plots or exits
+def score_symbol(item):
+    symbol, data = item
+    try:
+        df = prepare_dataframe(data.copy())
+        X_train, X_test, y_train, y_test = get_train_test(df)
+        model = get_model(X_train, y_train)
+        y_pred = get_prediction(model, X_test)
+        return pd.DataFrame({
+            "symbol": symbol,
+            "date": X_test.index,
+            "actual": y_test.values,
+            "predicted": y_pred,
+            "r2": r2_score(y_test, y_pred),
+            "mse": mean_squared_error(y_test, y_pred),
+            "error": None,
+        })
+    except Exception as e:
+        return error_rows([symbol], e)
+
+# a results table with one row per symbol that could not be scored
+def error_rows(symbols, error):
+    return pd.DataFrame({
+        "symbol": list(symbols),
+        "date": pd.NaT,
+        "actual": np.nan,
+        "predicted": np.nan,
+        "r2": np.nan,
+        "mse": np.nan,
+        "error": str(error),
+    })
+
+# headless batch mode: trains and scores the model for every symbol in symbols over the last num_days days.
+# records are fetched for up to BATCH_SYMBOLS symbols per request and split by symbol, and each symbol is
+# scored in a pool of worker processes while the next request is downloading. all results (r2, mse and the
+# test set predictions) are written to one parquet file at output, and returned as a dataframe.
+def batch_predict(client, symbols, num_days=NUM_DAYS, output="predictions.parquet", workers=None):
+    symbols = [symbol.upper() for symbol in symbols]
+    if not symbols:
+        table = error_rows([], None)
+        table.to_parquet(output)
+        return table
+    end_date = get_dataset_range(client, CHOSEN_DATASET)
+    start_date = end_date - timedelta(days=num_days)
+
+    results, futures = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i in range(0, len(symbols), BATCH_SYMBOLS):
+            chunk = symbols[i:i + BATCH_SYMBOLS]
+            try:
+                data = download_range(client, CHOSEN_DATASET, chunk, "ohlcv-1d", start_date, end_date)
+            except Exception as e:
+                results.append(error_rows(chunk, e))
+                continue
+            frames = split_by_symbol(data)
+            futures += [pool.submit(score_symbol, item) for item in frames.items()]
+            missing = [symbol for symbol in chunk if symbol not in frames]
+            if missing:
+                results.append(error_rows(missing, "no data"))
+        results += [future.result() for future in futures]
+
+    table = pd.concat(results, ignore_index=True)
+    table.to_parquet(output)
+    return table
+
+# times each stage of the pipeline (fetch, feature prep, split/impute, fit, predict) for every combination of
+# symbol count and history length, fetching all the symbols of a run in one request like batch_predict(). the
+# client defaults to a synthetic ReplayClient so that nothing is downloaded. each run is repeated without
+# tracemalloc for the timings, then once with it for the peak memory. returns a dataframe of seconds per
+# stage, throughput in symbols and rows per second, and peak memory in MiB, and prints it.
+def benchmark(client=None, symbol_counts=(1, 10, 100), history_days=(30, 90, 365), repeat=3):
+    client = client if client is not None else ReplayClient()
+    end_date = datetime.strptime(client.metadata.get_dataset_range(dataset=CHOSEN_DATASET)["end_date"], "%Y-%m-%d")
+    stages = ["fetch", "prepare", "split", "fit", "predict"]
+
+    def run(symbols, days, timings):
+        start = time.perf_counter()
+        data = download_range(client, CHOSEN_DATASET, symbols, "ohlcv-1d", end_date - timedelta(days=days), end_date)
+        timings["fetch"] += time.perf_counter() - start
+        for symbol, frame in split_by_symbol(data).items():
+            start = time.perf_counter()
+            df = prepare_dataframe(frame)
+            timings["prepare"] += time.perf_counter() - start
+            start = time.perf_counter()
+            X_train, X_test, y_train, y_test = get_train_test(df)
+            timings["split"] += time.perf_counter() - start
+            start = time.perf_counter()
+            model = get_model(X_train, y_train)
+            timings["fit"] += time.perf_counter() - start
+            start = time.perf_counter()
+            get_prediction(model, X_test)
+            timings["predict"] += time.perf_counter() - start
+        return len(data)
+
+    results = []
+    for count in symbol_counts:
+        symbols = [f"SYM{i:04d}" for i in range(count)]
+        for days in history_days:
+            timings = dict.fromkeys(stages, 0.0)
+            for _ in range(repeat):
+                rows = run(symbols, days, timings)
+            timings = {stage: seconds / repeat for stage, seconds in timings.items()}
+
+            tracemalloc.start()
+            run(symbols, days, dict.fromkeys(stages, 0.0))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            total = sum(timings.values())
+            results.append({"symbols": count, "days": days, "rows": rows, **timings, "total": total,
+                            "symbols_per_s": count / total, "rows_per_s": rows / total, "peak_mib": peak / 2**20})
+
+    table = pd.DataFrame(results)
+    print(table.to_string(index=False, float_format=lambda value: f"{value:.4g}"))
+    return table
+
+# runs the program interactively. a client (such as a ReplayClient) can be given, in which case no api key is asked for
+def main(num_days=NUM_DAYS, client=None):    
     print("(typing 'exit' will stop the program)")
 
+    replay = client is not None
     while True: # handles wrong api key
-        api_key = input_handler("Enter Databento API key, or hit enter to use default key: ")
-        if not api_key and DEFAULT_API_KEY != "":
-            api_key = DEFAULT_API_KEY
-        elif not api_key and DEFAULT_API_KEY == "":
-            print("No default API key is given. Please provide your own key.")
-            continue
-        client = create_client(api_key)
+        if not replay:
+            api_key = input_handler("Enter Databento API key, or hit enter to use default key: ")
+            if not api_key and DEFAULT_API_KEY != "":
+                api_key = DEFAULT_API_KEY
+            elif not api_key and DEFAULT_API_KEY == "":
+                print("No default API key is given. Please provide your own key.")
+                continue
+            client = create_client(api_key)
         symbol = input_handler("Enter a symbol you want to investigate: ").upper()
     
         try:
             data = check_symbol(client, symbol, num_days)
             break
         except:
+            if replay:
+                raise
             print("Invalid API Key. Please try again.")
     
     while data is None: # handles wrong symbol
@@ -198,25 +650,63 @@ def main(num_days=NUM_DAYS):
 
     print("Processing...")
 
-    try: # if this fails, it is because we have incomplete data for symbol
-        df_test, r2, mse, num_days, satisfactory = fetch_and_train_model(client, symbol, CHOSEN_DATASET, num_days, data)
+    # scores every training period up to MAX_DAYS from a single fetch. the scores are only estimates (the engine
+    # holds out different rows than the real pipeline), so they just decide which period is confirmed first
+    windows = list(range(num_days, MAX_DAYS + WINDOW_STEP + 1, WINDOW_STEP))
+    best_days = None
+    try:
+        longest = check_symbol(client, symbol, windows[-1])
+        best_days, curve = search_windows(longest, get_dataset_range(client, CHOSEN_DATASET), windows)
     except:
-        print(f"There is incomplete data available for the symbol {symbol}. Please try another symbol.")
-        print("Exiting the program...")
-        exit(1)
-
-    while not satisfactory: # we do not want to exceed a year of training data
-        if num_days > 365:
-            print("It was not possible to achieve satisfactory accuracy for the given symbol.")
-            exit()
+        pass
+
+    # the real pipeline decides: the estimated best period is tried first, and if it is accepted only the shorter
+    # periods are left to try, in order, so the result is always the shortest period that meets the threshold
+    order = windows if best_days is None else [best_days] + [days for days in windows if days != best_days]
+    found = None
+    for days in order:
+        if found is not None and days > found[3]:
+            break
+        try: # if this fails for the shortest period, it is because we have incomplete data for symbol
+            period_data = data if days == num_days else check_symbol(client, symbol, days)
+            df_test, r2, mse, days, satisfactory = fetch_and_train_model(client, symbol, CHOSEN_DATASET, days, period_data)
+        except:
+            if days == num_days:
+                print(f"There is incomplete data available for the symbol {symbol}. Please try another symbol.")
+                print("Exiting the program...")
+                exit(1)
+            continue
+        if satisfactory:
+            found = df_test, r2, mse, days
 
-        # add 10 days to training data if we get a an r squared value that is too low
-        num_days += 10
-        data = check_symbol(client, symbol, num_days)
-        df_test, r2, mse, num_days, satisfactory = fetch_and_train_model(client, symbol, CHOSEN_DATASET, num_days, data)
+    if found is None: # we do not want to exceed a year of training data
+        print("It was not possible to achieve satisfactory accuracy for the given symbol.")
+        exit()
+    df_test, r2, mse, num_days = found
 
     # plot findings
     plot_data(df_test, symbol, num_days, mse, r2)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Predict closing prices with a linear regression model.")
+    parser.add_argument("--batch", metavar="SYMBOLS_FILE",
+                        help="run headless for every symbol in this file (whitespace separated) instead of interactively")
+    parser.add_argument("--output", default="predictions.parquet", help="batch mode results file")
+    parser.add_argument("--days", type=int, default=NUM_DAYS, help="number of days of training data")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes in batch mode")
+    parser.add_argument("--replay", metavar="DIRECTORY", nargs="?", const="",
+                        help="use local files from DIRECTORY (or synthetic data, if none is given) instead of the API")
+    parser.add_argument("--benchmark", action="store_true", help="time each stage of the pipeline and exit")
+    args = parser.parse_args()
+
+    replay = None if args.replay is None else ReplayClient(args.replay or None)
+    if args.benchmark:
+        benchmark(replay)
+    elif args.batch:
+        with open(args.batch) as infile:
+            symbols = infile.read().split()
+        # uses the DATABENTO_API_KEY environment variable when no default key is set
+        client = replay if replay is not None else create_client(DEFAULT_API_KEY or None)
+        batch_predict(client, symbols, args.days, args.output, args.workers)
+    else:
+        main(args.days, replay)
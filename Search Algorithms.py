@@ -1,41 +1,588 @@
+import heapq
+import os
+import pickle
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+# Implement a compact graph in compressed sparse row (CSR) form. Vertex
+# labels are interned to ids 0..n-1; the neighbours of vertex v are
+# targets[offsets[v]:offsets[v + 1]]. Both arrays are array('q') so the
+# pure-Python traversals index them cheaply, and NumPy views of the same
+# memory are used by the vectorised traversal.
+class CSRGraph:
+    def __init__(self, offsets, targets, labels=None):
+        """
+        offsets: Sequence of n + 1 row offsets into targets
+        targets: Sequence of neighbour ids, grouped by source vertex
+        labels: Optional list mapping each id back to its vertex label
+        """
+        self.offsets = offsets if isinstance(offsets, array) else array("q", offsets)
+        self.targets = targets if isinstance(targets, array) else array("q", targets)
+        self.labels = labels
+        self.index = None if labels is None else {label: vertex for vertex, label in enumerate(labels)}
+        self.transposed = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    # Build a CSRGraph from the dictionary-of-sets representation used by
+    # depthFirstSearch() and bfs(). Vertices that only appear as
+    # neighbours are interned too, with no outgoing edges.
+    @classmethod
+    def from_dict(cls, graph):
+        """
+        graph: Graph represented as a dictionary
+        """
+        labels = list(graph)
+        index = {label: vertex for vertex, label in enumerate(labels)}
+        offsets, targets = array("q", [0]), array("q")
+        for label in list(labels):
+            for neighbour in graph[label]:
+                vertex = index.get(neighbour)
+                if vertex is None:
+                    vertex = index[neighbour] = len(labels)
+                    labels.append(neighbour)
+                targets.append(vertex)
+            offsets.append(len(targets))
+        offsets.extend([len(targets)] * (len(labels) + 1 - len(offsets)))
+        return cls(offsets, targets, labels)
+
+    # Build a CSRGraph from an iterable of (source, target) label pairs.
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        edges: Iterable of (source, target) pairs
+        """
+        labels, index = [], {}
+        sources, targets = array("q"), array("q")
+        for source, target in edges:
+            for label, column in ((source, sources), (target, targets)):
+                vertex = index.get(label)
+                if vertex is None:
+                    vertex = index[label] = len(labels)
+                    labels.append(label)
+                column.append(vertex)
+        graph = cls.from_arrays(sources, targets, len(labels))
+        graph.labels, graph.index = labels, index
+        return graph
+
+    # Build a CSRGraph from parallel arrays of source and target ids
+    # (already integers 0..size-1). This path is vectorised with NumPy and
+    # is the one to use for graphs with millions of edges.
+    @classmethod
+    def from_arrays(cls, sources, targets, size=None):
+        """
+        sources: Array of source vertex ids
+        targets: Array of target vertex ids, parallel to sources
+        size: Number of vertices (defaults to the largest id + 1)
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if size is None:
+            size = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=size), out=offsets[1:])
+        return cls(array("q", offsets.tobytes()), array("q", targets[order].tobytes()))
+
+    # Convert between vertex labels and ids.
+    def vertex(self, label):
+        return label if self.index is None else self.index[label]
+
+    def label(self, vertex):
+        return vertex if self.labels is None else self.labels[vertex]
+
+    # Return the neighbour ids of a vertex id.
+    def neighbours(self, vertex):
+        return self.targets[self.offsets[vertex]:self.offsets[vertex + 1]]
+
+    # Return the transposed graph (every edge reversed), built once and
+    # then kept with this graph. Used to search backwards from a target.
+    def transpose(self):
+        if self.transposed is None:
+            offsets, targets = self.arrays()
+            sources = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(offsets))
+            self.transposed = CSRGraph.from_arrays(targets, sources, len(self))
+            self.transposed.labels, self.transposed.index = self.labels, self.index
+        return self.transposed
+
+    # Return a NumPy view of the offsets and targets arrays (no copy).
+    def arrays(self):
+        return (np.frombuffer(self.offsets, dtype=np.int64),
+                np.frombuffer(self.targets, dtype=np.int64))
+
+    # Depth-first traversal from a vertex id. The visited set is a
+    # bytearray with one byte per vertex, and the stack is two
+    # preallocated arrays: the vertices on the current path and, for
+    # each, the next edge of it to look at. A vertex is marked when it is
+    # pushed and its edge cursor is advanced in place, so the stack never
+    # holds more than n entries. Returns the reached ids in DFS preorder,
+    # the order a recursive depth-first search would visit them.
+    def dfs(self, start):
+        """
+        start: Starting vertex id
+        """
+        offsets, targets = self.offsets, self.targets
+        visited = bytearray(len(self))
+        stack = array("q", bytes(8 * len(self)))
+        cursor = array("q", bytes(8 * len(self)))
+        order = array("q", [start])
+        visited[start] = 1
+        stack[0], cursor[0] = start, offsets[start]
+        top = 1
+        while top:
+            edge, end = cursor[top - 1], offsets[stack[top - 1] + 1]
+            while edge < end and visited[targets[edge]]:
+                edge += 1
+            if edge == end:
+                top -= 1
+                continue
+            cursor[top - 1] = edge + 1
+            neighbour = targets[edge]
+            visited[neighbour] = 1
+            order.append(neighbour)
+            stack[top], cursor[top] = neighbour, offsets[neighbour]
+            top += 1
+        return order
+
+    # Breadth-first traversal from a vertex id, with the same bytearray
+    # visited set. The queue is a preallocated array that doubles as the
+    # result: it holds every reached id in visiting order.
+    def bfs(self, root):
+        """
+        root: Starting vertex id
+        """
+        offsets, targets = self.offsets, self.targets
+        visited = bytearray(len(self))
+        queue = array("q", bytes(8 * len(self)))
+        visited[root] = 1
+        queue[0] = root
+        head, tail = 0, 1
+        while head < tail:
+            vertex = queue[head]
+            head += 1
+            for edge in range(offsets[vertex], offsets[vertex + 1]):
+                neighbour = targets[edge]
+                if not visited[neighbour]:
+                    visited[neighbour] = 1
+                    queue[tail] = neighbour
+                    tail += 1
+        return queue[:tail]
+
+    # Level-synchronous breadth-first search, vectorised with NumPy. Each
+    # level gathers the neighbours of the whole frontier at once, keeps the
+    # ones not reached yet and gives each of them one parent from the
+    # frontier. Returns (distance, parent) arrays indexed by vertex id:
+    # unreached vertices have distance and parent -1, roots are their own
+    # parent.
+    def bfs_levels(self, roots):
+        """
+        roots: Starting vertex id, or an iterable of ids
+        """
+        offsets, targets = self.arrays()
+        distance = np.full(len(self), -1, dtype=np.int64)
+        parent = np.full(len(self), -1, dtype=np.int64)
+        frontier = np.unique(np.asarray(roots, dtype=np.int64).reshape(-1))
+        distance[frontier] = 0
+        parent[frontier] = frontier
+        level = 0
+        while frontier.size:
+            level += 1
+            starts = offsets[frontier]
+            counts = offsets[frontier + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                break
+            firsts = np.cumsum(counts) - counts
+            edges = np.arange(total) + np.repeat(starts - firsts, counts)
+            neighbours = targets[edges]
+            owners = np.repeat(frontier, counts)
+            fresh = distance[neighbours] < 0
+            frontier, first = np.unique(neighbours[fresh], return_index=True)
+            distance[frontier] = level
+            parent[frontier] = owners[fresh][first]
+        return distance, parent
+
 # Implement the Depth-First Search algorithm on a graph.
 def depthFirstSearch(graph, start):
     """
-    graph: Graph represented as a dictionary
+    graph: Graph represented as a dictionary, or a CSRGraph
     start: Starting vertex
     """
-    visited, stack = set(), [start]
-    while stack:
-        vertex = stack.pop()
-        if vertex not in visited:
-            visited.add(vertex)
-            stack.extend(graph[vertex] - visited)
-    return visited
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    return set(map(graph.label, graph.dfs(graph.vertex(start))))
 
 # Implement the Breadth-First Search algorithm on a graph.
-from collections import deque
 def bfs(graph, root):
     """
-    graph: Graph represented as a dictionary
+    graph: Graph represented as a dictionary, or a CSRGraph
     root: Starting vertex
     """
-    visited, queue = set(), deque([root])
-    while queue:
-        vertex = queue.popleft()
-        if vertex not in visited:
-            visited.add(vertex)
-            queue.extend(graph[vertex] - visited)
-    return visited
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    return set(map(graph.label, graph.bfs(graph.vertex(root))))
     
+# Follow a parents dictionary (vertex id -> parent id, None at the root)
+# from vertex back to its root. Returns the ids from the root to vertex.
+def tracePath(parents, vertex):
+    """
+    parents: Dictionary of parent ids, as built by the searches below
+    vertex: Vertex id to trace back from
+    """
+    path = []
+    while vertex is not None:
+        path.append(vertex)
+        vertex = parents[vertex]
+    path.reverse()
+    return path
+
+# Implement bidirectional Breadth-First Search between two vertices.
+# Whole levels are expanded from whichever side has the smaller frontier
+# (the backward side walks the transposed graph), and the search stops at
+# the end of the first level where the two sides meet, which is where the
+# shortest path is found. Returns a dictionary with the path (list of
+# vertex labels, or None if unreachable within max_depth), its distance,
+# and counters for the vertices expanded and edges scanned.
+def bidirectionalSearch(graph, source, target, max_depth=None):
+    """
+    graph: Graph represented as a dictionary, or a CSRGraph
+    source: Starting vertex
+    target: Vertex to reach
+    max_depth: Optional limit on the path length
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    start, goal = graph.vertex(source), graph.vertex(target)
+    result = {"path": None, "distance": None, "expanded": 0, "edges": 0}
+    if start == goal:
+        result.update(path=[source], distance=0)
+        return result
+    graphs = (graph, graph.transpose())
+    parents = ({start: None}, {goal: None})
+    depths = ({start: 0}, {goal: 0})
+    frontiers = [[start], [goal]]
+    levels = [0, 0]
+    while frontiers[0] and frontiers[1]:
+        if max_depth is not None and levels[0] + levels[1] >= max_depth:
+            break
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        offsets, targets = graphs[side].offsets, graphs[side].targets
+        mine, theirs = depths[side], depths[1 - side]
+        parent = parents[side]
+        level = levels[side] + 1
+        best = None
+        frontier = []
+        for vertex in frontiers[side]:
+            result["expanded"] += 1
+            result["edges"] += offsets[vertex + 1] - offsets[vertex]
+            for edge in range(offsets[vertex], offsets[vertex + 1]):
+                neighbour = targets[edge]
+                if neighbour in mine:
+                    continue
+                mine[neighbour] = level
+                parent[neighbour] = vertex
+                frontier.append(neighbour)
+                if neighbour in theirs and (best is None or level + theirs[neighbour] < best[0]):
+                    best = (level + theirs[neighbour], neighbour)
+        frontiers[side] = frontier
+        levels[side] = level
+        if best is not None:
+            path = tracePath(parents[0], best[1]) + tracePath(parents[1], best[1])[-2::-1]
+            result.update(path=[graph.label(vertex) for vertex in path], distance=best[0])
+            break
+    return result
+
+# Implement multi-source Breadth-First Search. All seeds start at
+# distance 0; the search stops at the first vertex whose label satisfies
+# goal (the nearest one to any seed), or once every vertex within
+# max_depth has been reached. Returns a dictionary with the path from its
+# seed to the goal vertex (None when goal is not given or not found), its
+# distance, the distance of every reached vertex by label, and counters
+# for the vertices expanded and edges scanned.
+def multiSourceSearch(graph, seeds, goal=None, max_depth=None):
+    """
+    graph: Graph represented as a dictionary, or a CSRGraph
+    seeds: Iterable of starting vertices
+    goal: Optional predicate called with a vertex label
+    max_depth: Optional limit on the distance from the seeds
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    offsets, targets = graph.offsets, graph.targets
+    parents, depths, frontier = {}, {}, []
+    result = {"path": None, "distance": None, "distances": None, "expanded": 0, "edges": 0}
+    found = None
+    for seed in seeds:
+        vertex = graph.vertex(seed)
+        if vertex not in parents:
+            parents[vertex], depths[vertex] = None, 0
+            frontier.append(vertex)
+            if found is None and goal is not None and goal(seed):
+                found = vertex
+    level = 0
+    while frontier and found is None and (max_depth is None or level < max_depth):
+        level += 1
+        current, frontier = frontier, []
+        for vertex in current:
+            result["expanded"] += 1
+            result["edges"] += offsets[vertex + 1] - offsets[vertex]
+            for edge in range(offsets[vertex], offsets[vertex + 1]):
+                neighbour = targets[edge]
+                if neighbour in parents:
+                    continue
+                parents[neighbour], depths[neighbour] = vertex, level
+                frontier.append(neighbour)
+                if goal is not None and goal(graph.label(neighbour)):
+                    found = neighbour
+                    break
+            if found is not None:
+                break
+    if found is not None:
+        result.update(path=[graph.label(vertex) for vertex in tracePath(parents, found)], distance=depths[found])
+    result["distances"] = {graph.label(vertex): depth for vertex, depth in depths.items()}
+    return result
+
+# Sorting constants: ranges shorter than INSERTION_THRESHOLD are finished
+# with insertion sort, lists of at least NUMPY_THRESHOLD plain ints or
+# floats are sorted through NumPy, inputs of at least PARALLEL_THRESHOLD
+# items are split across processes, and external sort runs are pickled to
+# disk RUN_BATCH items at a time.
+INSERTION_THRESHOLD = 16
+NUMPY_THRESHOLD = 64
+PARALLEL_THRESHOLD = 100000
+RUN_SIZE = 100000
+RUN_BATCH = 1024
+FAN_IN = 64
+
+# Sort keys[lo..hi] (inclusive) with insertion sort, moving the items of
+# arr alongside when a separate list of keys is being sorted.
+def insertionSort(arr, keys, lo, hi):
+    paired = keys is not arr
+    for i in range(lo + 1, hi + 1):
+        current, item = keys[i], arr[i]
+        j = i - 1
+        while j >= lo and current < keys[j]:
+            keys[j + 1] = keys[j]
+            if paired:
+                arr[j + 1] = arr[j]
+            j -= 1
+        keys[j + 1] = current
+        if paired:
+            arr[j + 1] = item
+
+# Sort keys[lo..hi] (inclusive) with heapsort, the worst-case fallback of
+# introsort, moving the items of arr alongside.
+def heapSort(arr, keys, lo, hi):
+    paired = keys is not arr
+    size = hi - lo + 1
+
+    def siftDown(root, end):
+        while True:
+            child = 2 * root + 1
+            if child >= end:
+                return
+            if child + 1 < end and keys[lo + child] < keys[lo + child + 1]:
+                child += 1
+            if not keys[lo + root] < keys[lo + child]:
+                return
+            a, b = lo + root, lo + child
+            keys[a], keys[b] = keys[b], keys[a]
+            if paired:
+                arr[a], arr[b] = arr[b], arr[a]
+            root = child
+
+    for root in range(size // 2 - 1, -1, -1):
+        siftDown(root, size)
+    for end in range(size - 1, 0, -1):
+        keys[lo], keys[lo + end] = keys[lo + end], keys[lo]
+        if paired:
+            arr[lo], arr[lo + end] = arr[lo + end], arr[lo]
+        siftDown(0, end)
+
+# Partition keys[lo..hi] around the median of the first, middle and last
+# keys (Hoare scheme). Returns p such that every key in lo..p is <= every
+# key in p+1..hi.
+def partition(arr, keys, lo, hi):
+    paired = keys is not arr
+    mid = (lo + hi) // 2
+    for a, b in ((lo, mid), (mid, hi), (lo, mid)):
+        if keys[b] < keys[a]:
+            keys[a], keys[b] = keys[b], keys[a]
+            if paired:
+                arr[a], arr[b] = arr[b], arr[a]
+    pivot = keys[mid]
+    i, j = lo - 1, hi + 1
+    while True:
+        i += 1
+        while keys[i] < pivot:
+            i += 1
+        j -= 1
+        while pivot < keys[j]:
+            j -= 1
+        if i >= j:
+            return j
+        keys[i], keys[j] = keys[j], keys[i]
+        if paired:
+            arr[i], arr[j] = arr[j], arr[i]
+
+# Implement introsort: quicksort with median-of-three pivots, insertion
+# sort for short ranges, and heapsort for any range that recurses deeper
+# than 2*log2(n), so the worst case stays O(n log n). Sorts arr in place
+# without recursion (pending ranges go on an explicit stack, smaller
+# side first) and returns it. Like sorted(), only < is used; unlike
+# sorted(), the sort is not stable.
+def introsort(arr, key=None):
+    """
+    arr: List of elements to sort in place
+    key: Optional function computing the sort key of each element
+    """
+    keys = arr if key is None else [key(item) for item in arr]
+    stack = [(0, len(arr) - 1, 2 * len(arr).bit_length())]
+    while stack:
+        lo, hi, depth = stack.pop()
+        while hi - lo >= INSERTION_THRESHOLD:
+            if not depth:
+                heapSort(arr, keys, lo, hi)
+                break
+            depth -= 1
+            p = partition(arr, keys, lo, hi)
+            if p - lo < hi - p:
+                stack.append((p + 1, hi, depth))
+                hi = p
+            else:
+                stack.append((lo, p, depth))
+                lo = p + 1
+        else:
+            insertionSort(arr, keys, lo, hi)
+    return arr
+
+# Sort arr in place with the fastest applicable method: NumPy's sort for
+# numeric arrays and for long lists of plain ints (that fit in 64 bits)
+# or floats, and introsort for everything else. Returns arr.
+def hybridSort(arr, key=None):
+    """
+    arr: List (or NumPy array) of elements to sort in place
+    key: Optional function computing the sort key of each element
+    """
+    if key is None and isinstance(arr, np.ndarray) and arr.dtype.kind in "biuf":
+        arr.sort()
+        return arr
+    if key is None and isinstance(arr, list) and len(arr) >= NUMPY_THRESHOLD:
+        kind = type(arr[0])
+        if kind in (int, float) and all(type(item) is kind for item in arr):
+            try:
+                values = np.array(arr, dtype=np.int64 if kind is int else np.float64)
+            except OverflowError:
+                pass
+            else:
+                values.sort()
+                arr[:] = values.tolist()
+                return arr
+    return introsort(arr, key)
+
+# Sort a large list in place by splitting it into one chunk per worker
+# process, sorting the chunks with hybridSort() in parallel and merging
+# them back with a k-way heap merge. key must be picklable (a module level
+# function, not a lambda). Small inputs are sorted in this process.
+def parallelSort(arr, key=None, workers=None):
+    """
+    arr: List of elements to sort in place
+    key: Optional picklable function computing the sort key
+    workers: Number of worker processes (defaults to the CPU count)
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(arr) < PARALLEL_THRESHOLD or isinstance(arr, np.ndarray):
+        return hybridSort(arr, key)
+    size = -(-len(arr) // workers)
+    chunks = [arr[start:start + size] for start in range(0, len(arr), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        runs = list(pool.map(partial(hybridSort, key=key), chunks))
+    arr[:] = heapq.merge(*runs, key=key)
+    return arr
+
+# Write an iterable of items to a new temporary run file, pickled in
+# batches of RUN_BATCH items. Returns the file name; if writing fails the
+# partial file is removed.
+def writeRun(items, directory=None):
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".run", delete=False) as outfile:
+        try:
+            batch = []
+            for item in items:
+                batch.append(item)
+                if len(batch) >= RUN_BATCH:
+                    pickle.dump(batch, outfile, pickle.HIGHEST_PROTOCOL)
+                    batch = []
+            if batch:
+                pickle.dump(batch, outfile, pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            outfile.close()
+            os.remove(outfile.name)
+            raise
+    return outfile.name
+
+# Stream the items of a run file written by writeRun() back in order.
+def readRun(filename):
+    with open(filename, "rb") as infile:
+        while True:
+            try:
+                batch = pickle.load(infile)
+            except EOFError:
+                return
+            yield from batch
+
+# Implement external merge sort for data bigger than memory. Items are
+# read from any iterable in runs of run_size, each run is sorted and
+# written to a temporary file, runs are merged fan_in at a time until at
+# most fan_in remain, and the final merge is streamed back. Yields the
+# items in sorted order; temporary files are removed when the generator
+# finishes, is closed or fails. fan_in must be at least 2.
+def externalSort(items, key=None, run_size=RUN_SIZE, fan_in=FAN_IN, directory=None):
+    """
+    items: Iterable of elements to sort
+    key: Optional function computing the sort key of each element
+    run_size: Number of items sorted in memory at a time
+    fan_in: Maximum number of runs merged at once
+    directory: Directory for the temporary run files
+    """
+    if fan_in < 2:
+        raise ValueError("fan_in must be at least 2")
+    runs, batch = [], []
+    try:
+        for item in items:
+            batch.append(item)
+            if len(batch) >= run_size:
+                runs.append(writeRun(hybridSort(batch, key), directory))
+                batch = []
+        if not runs:
+            yield from hybridSort(batch, key)
+            return
+        if batch:
+            runs.append(writeRun(hybridSort(batch, key), directory))
+            batch = []
+        while len(runs) > fan_in:
+            # the group stays in runs until its merged run is written, so
+            # the finally clause removes it if the merge fails
+            group = runs[:fan_in]
+            merged = writeRun(heapq.merge(*map(readRun, group), key=key), directory)
+            runs = runs[fan_in:] + [merged]
+            for filename in group:
+                os.remove(filename)
+        yield from heapq.merge(*map(readRun, runs), key=key)
+    finally:
+        for filename in runs:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
 # Implement the quicksort sorting algorithm.
 def quicksort(arr):
     """
     arr: List of elements to sort
     """
-    if len(arr) <= 1:
-        return arr
-    pivot = arr[len(arr) // 2]
-    left = [x for x in arr if x < pivot]
-    middle = [x for x in arr if x == pivot]
-    right = [x for x in arr if x > pivot]
-    return quicksort(left) + middle + quicksort(right)
+    return hybridSort(list(arr))
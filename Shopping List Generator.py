@@ -3,19 +3,207 @@ SHOPPING LIST GENERATOR
 
 Whenever I meal prep, I deal with a lot of recipes that overlap in terms of their ingredients.
 This simple program combines all your recipes into a single shopping list.
+
+Recipes can also be read in bulk from files or directories (one ingredient per line or
+comma-separated, e.g. 'flour 500 g', '2 cups milk', 'eggs 3'). Quantities are converted to
+grams or millilitres where the unit is known, ingredient names are made singular, and the
+combined list can be written out as CSV or JSON:
+
+    python "Shopping List Generator.py" recipes/ --output shopping.csv
 """
 
+import argparse
+import csv
+import json
+import os
 import re
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Parsing patterns, compiled once: SPLIT_PATTERN separates the items of a
+# recipe, ITEM_PATTERN is the interactive 'item quantity' format, and
+# QUANTITY_PATTERN matches a number (optionally a fraction or with a unit
+# attached, as in '500g') in recipe files.
+SPLIT_PATTERN = re.compile(",|\n")
+ITEM_PATTERN = re.compile(r'(\w+)\s*(\d*)')
+QUANTITY_PATTERN = re.compile(r'(\d+(?:\.\d+)?|\d+/\d+)([^\W\d_]+)?')
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s'./-]")
+
+# Known units, mapped to the unit quantities are added up in and the
+# factor to convert to it. Units that are not weights or volumes are
+# counted as they are.
+UNITS = {
+    "g": ("g", 1), "gram": ("g", 1), "gr": ("g", 1), "kg": ("g", 1000), "kilogram": ("g", 1000),
+    "mg": ("g", 0.001), "oz": ("g", 28.3495), "ounce": ("g", 28.3495),
+    "lb": ("g", 453.592), "lbs": ("g", 453.592), "pound": ("g", 453.592),
+    "ml": ("ml", 1), "milliliter": ("ml", 1), "millilitre": ("ml", 1), "cl": ("ml", 10),
+    "dl": ("ml", 100), "l": ("ml", 1000), "liter": ("ml", 1000), "litre": ("ml", 1000),
+    "tsp": ("ml", 5), "teaspoon": ("ml", 5), "tbsp": ("ml", 15), "tbs": ("ml", 15),
+    "tablespoon": ("ml", 15), "cup": ("ml", 240), "pint": ("ml", 473.176),
+    "quart": ("ml", 946.353), "gallon": ("ml", 3785.41),
+}
+UNITS.update((unit, (unit, 1)) for unit in ["clove", "can", "slice", "pinch", "bunch", "handful", "piece",
+                                             "pack", "jar", "stick", "sprig", "head", "dash", "bottle"])
+
+# Words ending in 's' that are not plurals, and plurals that do not
+# follow the usual rules.
+SINGULAR_WORDS = {"asparagus", "couscous", "hummus", "molasses", "swiss", "grits", "series", "species", "oats"}
+IRREGULAR_PLURALS = {"leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife",
+                     "potatoes": "potato", "tomatoes": "tomato", "mangoes": "mango", "cheeses": "cheese"}
+RECIPE_BATCH = 64
+
+
+# singular(word) returns the singular form of an English noun, using
+# IRREGULAR_PLURALS and the common -ies/-ches/-es/-s endings.
+def singular(word):
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) < 3 or word in SINGULAR_WORDS or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "xes", "zes", "sses")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+# unit_of(word) returns (unit, factor) for a known unit word such as
+# 'cups' or 'Tbsp.', or None.
+def unit_of(word):
+    word = word.rstrip(".")
+    return UNITS.get(word) or UNITS.get(singular(word))
+
+# number(text) turns '3', '1.5' or '1/2' into a number.
+def number(text):
+    if "/" in text:
+        top, bottom = text.split("/")
+        return int(top) / int(bottom) if int(bottom) else 0
+    return float(text) if "." in text else int(text)
+
+# leading_quantity(words) reads the '[quantity [unit] [of]]' at the start
+# of an item's words and returns (quantity, unit, remaining words), or
+# None when the item does not start with a quantity. A number glued to
+# letters that are not a unit (as in '7up') is part of the name, and so
+# is a quantity that would leave no name behind.
+def leading_quantity(words):
+    first = QUANTITY_PATTERN.fullmatch(words[0])
+    if not first:
+        return None
+    quantity, attached, rest = number(first.group(1)), first.group(2), words[1:]
+    fraction = QUANTITY_PATTERN.fullmatch(rest[0]) if rest else None
+    if not attached and first.group(1).isdigit() and fraction and "/" in fraction.group(1):
+        # a mixed number such as '1 1/2'
+        quantity, attached, rest = quantity + number(fraction.group(1)), fraction.group(2), rest[1:]
+    unit = None
+    if attached:
+        unit = unit_of(attached)
+        if unit is None:
+            return None
+    elif len(rest) > 1 and unit_of(rest[0]):
+        unit = unit_of(rest[0])
+        rest = rest[1:]
+    if len(rest) > 1 and rest[0] == "of":
+        rest = rest[1:]
+    return (quantity, unit, rest) if rest else None
+
+# parse_item(item) parses one ingredient from a recipe file, written
+# either as 'name [quantity [unit]]' or '[quantity [unit] [of]] name'.
+# The quantity may be a mixed number such as '1 1/2'. An item made of
+# numbers only, such as '2 1/2', is kept whole as the name.
+# Returns ((ingredient, unit), quantity) with the quantity converted to
+# the unit's base, or None for blank items and the 'done' sentinel.
+def parse_item(item):
+    words = [word.strip(".'-") for word in PUNCTUATION_PATTERN.sub(" ", item.lower()).split()]
+    words = [word for word in words if word]
+    if not words or words == ["done"]:
+        return None
+    quantity, unit = 1, None
+    if all(QUANTITY_PATTERN.fullmatch(word) and not QUANTITY_PATTERN.fullmatch(word).group(2) for word in words):
+        return (" ".join(words), ""), 1
+    leading = leading_quantity(words)
+    last = QUANTITY_PATTERN.fullmatch(words[-1])
+    if leading:
+        quantity, unit, words = leading
+    elif last and len(words) > 1:
+        quantity, attached = number(last.group(1)), last.group(2)
+        words = words[:-1]
+        if "/" in last.group(1) and len(words) > 1 and words[-1].isdigit():
+            quantity += int(words.pop())
+        if attached:
+            unit = unit_of(attached)
+            if unit is None:
+                words.append(attached)
+    elif len(words) > 2 and unit_of(words[-1]) and QUANTITY_PATTERN.fullmatch(words[-2]) \
+            and not QUANTITY_PATTERN.fullmatch(words[-2]).group(2):
+        quantity, unit = number(words[-2]), unit_of(words[-1])
+        fraction = "/" in words[-2]
+        words = words[:-2]
+        if fraction and len(words) > 1 and words[-1].isdigit():
+            quantity += int(words.pop())
+    words[-1] = singular(words[-1])
+    if unit is None:
+        return (" ".join(words), ""), quantity
+    return (" ".join(words), unit[0]), quantity * unit[1]
+
+# parse_recipe(text) returns a Counter of quantity per (ingredient, unit)
+# for the text of one recipe.
+def parse_recipe(text):
+    counts = Counter()
+    for item in SPLIT_PATTERN.split(text):
+        parsed = parse_item(item)
+        if parsed:
+            counts[parsed[0]] += parsed[1]
+    return counts
+
+# count_files(paths) is the map step run in worker processes: it reads a
+# batch of recipe files and returns their combined Counter.
+def count_files(paths):
+    counts = Counter()
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as infile:
+            counts.update(parse_recipe(infile.read()))
+    return counts
+
+# recipe_files(sources) yields every file named in sources, walking into
+# directories (hidden files and directories are skipped).
+def recipe_files(sources):
+    for source in sources:
+        if not os.path.isdir(source):
+            yield source
+            continue
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if not name.startswith("."):
+                    yield os.path.join(root, name)
+
+# batches(iterable, size) groups an iterable into lists of up to size
+# items.
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# format_quantity(quantity) prints whole numbers without a decimal point
+# and rounds the rest to three places.
+def format_quantity(quantity):
+    return int(quantity) if quantity == int(quantity) else round(quantity, 3)
 
 class ShoppingListGenerator:
     def __init__(self):
-        self.shopping_list = defaultdict(int)
+        # Quantities keyed by (ingredient, unit); unit is "" for plain counts
+        self.shopping_list = Counter()
 
     def parse_input(self, user_input):
-        items = [item.strip() for item in re.split(",|\n", user_input)]
+        items = [item.strip() for item in SPLIT_PATTERN.split(user_input)]
         for item in items:
-            match = re.match(r'(\w+)\s*(\d*)', item)
+            match = ITEM_PATTERN.match(item)
             if match:
                 ingredient, quantity = match.groups()
                 quantity = int(quantity) if quantity else 1
@@ -24,13 +212,61 @@ class ShoppingListGenerator:
     def add_recipe(self):
         while True:
             user_input = input("> ")
+            for ingredient, quantity in self.parse_input(user_input):
+                if ingredient != "done":
+                    self.shopping_list[ingredient, ""] += quantity
             if 'done' in user_input.lower():
-                for ingredient, quantity in self.parse_input(user_input):
-                    self.shopping_list[ingredient] += quantity
                 break
+
+    # Add the ingredients of a recipe given as text.
+    def add_text(self, text):
+        self.shopping_list.update(parse_recipe(text))
+
+    # Add every recipe file in sources (files or directories). Files are
+    # parsed in batches across a process pool and the per-batch Counters
+    # are merged here as they come back.
+    def add_files(self, sources, workers=None):
+        workers = workers or os.cpu_count() or 1
+        jobs = batches(recipe_files(sources), RECIPE_BATCH)
+        if workers == 1:
+            for batch in jobs:
+                self.shopping_list.update(count_files(batch))
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for counts in pool.map(count_files, jobs):
+                self.shopping_list.update(counts)
+
+    # Return the shopping list as rows of (ingredient, quantity, unit),
+    # sorted by ingredient.
+    def rows(self):
+        return [(ingredient, format_quantity(quantity), unit)
+                for (ingredient, unit), quantity in sorted(self.shopping_list.items())]
+
+    def write_csv(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(["ingredient", "quantity", "unit"])
+            writer.writerows(self.rows())
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as outfile:
+            json.dump([{"ingredient": ingredient, "quantity": quantity, "unit": unit}
+                       for ingredient, quantity, unit in self.rows()], outfile, indent=2)
+
+    # Write the shopping list as JSON if path ends in .json, otherwise CSV.
+    def save(self, path):
+        if path.lower().endswith(".json"):
+            self.write_json(path)
+        else:
+            self.write_csv(path)
+
+    def print_shopping_list(self):
+        print("\nShopping List:")
+        for (item, unit), quantity in self.shopping_list.items():
+            if unit:
+                print(f"{item}: {format_quantity(quantity)} {unit}")
             else:
-                for ingredient, quantity in self.parse_input(user_input):
-                    self.shopping_list[ingredient] += quantity
+                print(f"{item}: {format_quantity(quantity)}")
 
     def generate_shopping_list(self):
         print("Enter recipes. Type 'done' when you've entered all ingredients for a recipe.")
@@ -40,11 +276,21 @@ class ShoppingListGenerator:
             if input("Would you like to add another recipe? (y/n)").lower() != 'y':
                 break
 
-        print("\nShopping List:")
-        for item, quantity in self.shopping_list.items():
-            if item != "done":
-                print(f"{item}: {quantity}")
+        self.print_shopping_list()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Combine recipes into a single shopping list.")
+    parser.add_argument("sources", nargs="*", help="recipe files or directories (interactive if none)")
+    parser.add_argument("--output", help="write the list to this .csv or .json file")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for reading files")
+    args = parser.parse_args()
+
     s = ShoppingListGenerator()
-    s.generate_shopping_list()
+    if args.sources:
+        s.add_files(args.sources, args.workers)
+        if not args.output:
+            s.print_shopping_list()
+    else:
+        s.generate_shopping_list()
+    if args.output:
+        s.save(args.output)
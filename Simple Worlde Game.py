@@ -1,5 +1,16 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from random import choice
 
+import numpy as np
+
 """WORLDE GAME"""
 
 # readWords(filename) takes a single value, a string,
@@ -31,7 +42,389 @@ def evalGuess(guess, target):
         count += 1
     return "".join(L)
 
-# wordle(S) takes a list of words, S, and randomly
+# Word index constants: every word in the index is WORD_LENGTH letters
+# long, and INDEX_MAGIC tags the first bytes of a compiled index file.
+WORD_LENGTH = 5
+INDEX_MAGIC = b"WRDIDX01"
+INDEX_HEADER = struct.Struct("<8sIIII")
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# WordIndex is a compiled, read-only view of a word list. Each word is
+# packed into a 64-bit code (one letter id per field), the codes are kept
+# in an open-addressing hash table for membership checks, and for every
+# (position, letter) and every (letter, count) pair there is a bitset
+# over the words so candidate filtering is done with bitwise ANDs. The
+# alphabet is taken from the word list itself, so dictionaries in any
+# language work as long as it has fewer than 4096 distinct letters.
+class WordIndex:
+    def __init__(self, buffer, source=None):
+        self.buffer = memoryview(buffer)
+        self.source = source
+        magic, self.size, letters, self.table_size, alphabet_size = INDEX_HEADER.unpack_from(self.buffer)
+        if magic != INDEX_MAGIC:
+            raise ValueError("not a word index file")
+        offset = INDEX_HEADER.size
+        self.alphabet = bytes(self.buffer[offset:offset + alphabet_size]).decode("utf-8")
+        offset += -(-alphabet_size // 8) * 8
+        self.letters = {letter: number + 1 for number, letter in enumerate(self.alphabet)}
+        self.bits = max(1, len(self.alphabet).bit_length())
+        self.shift = 64 - (self.table_size.bit_length() - 1)
+        self.codes = self.buffer[offset:offset + 8 * self.size].cast("Q")
+        offset += 8 * self.size
+        self.table = self.buffer[offset:offset + 8 * self.table_size].cast("Q")
+        offset += 8 * self.table_size
+        self.stride = -(-self.size // 64) * 8
+        self.positions = offset
+        self.counts = offset + WORD_LENGTH * len(self.alphabet) * self.stride
+        self.everything = (1 << self.size) - 1
+        self.bitsets = {}
+
+    # build(words) compiles a list of words into the binary index format
+    # and returns the bytes. Words that are not WORD_LENGTH letters long
+    # or that repeat an earlier word are left out.
+    @staticmethod
+    def build(words):
+        unique = []
+        seen = set()
+        for word in words:
+            if len(word) == WORD_LENGTH and word not in seen:
+                seen.add(word)
+                unique.append(word)
+        alphabet = "".join(sorted(set("".join(unique))))
+        if len(alphabet) >= 1 << (64 // WORD_LENGTH):
+            raise ValueError("alphabet too large for a word index")
+        letters = {letter: number + 1 for number, letter in enumerate(alphabet)}
+        bits = max(1, len(alphabet).bit_length())
+        table_size = 2
+        while table_size < 2 * len(unique):
+            table_size *= 2
+        shift = 64 - (table_size.bit_length() - 1)
+        stride = -(-len(unique) // 64) * 8
+        codes = array("Q")
+        table = array("Q", bytes(8 * table_size))
+        positions = [bytearray(stride) for _ in range(WORD_LENGTH * len(alphabet))]
+        counts = [bytearray(stride) for _ in range(WORD_LENGTH * len(alphabet))]
+        for number, word in enumerate(unique):
+            code = 0
+            for position, letter in enumerate(word):
+                code |= letters[letter] << (bits * position)
+            codes.append(code)
+            slot = ((code * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> shift
+            while table[slot]:
+                slot = (slot + 1) & (table_size - 1)
+            table[slot] = code
+            byte, bit = number >> 3, 1 << (number & 7)
+            for position, letter in enumerate(word):
+                positions[position * len(alphabet) + letters[letter] - 1][byte] |= bit
+            for letter in set(word):
+                for count in range(word.count(letter)):
+                    counts[(letters[letter] - 1) * WORD_LENGTH + count][byte] |= bit
+        encoded = alphabet.encode("utf-8")
+        parts = [INDEX_HEADER.pack(INDEX_MAGIC, len(unique), len(alphabet), table_size, len(encoded)),
+                 encoded, bytes(-len(encoded) % 8), codes.tobytes(), table.tobytes()]
+        parts.extend(positions)
+        parts.extend(counts)
+        return b"".join(parts)
+
+    # open(filename) memory-maps a compiled index file and returns a
+    # WordIndex reading straight from the mapping.
+    @classmethod
+    def open(cls, filename):
+        with open(filename, "rb") as infile:
+            mapping = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapping, filename)
+
+    # encode(word) returns the packed code of word, or 0 when the word
+    # cannot be in the index (wrong length or unknown letter).
+    def encode(self, word):
+        if len(word) != WORD_LENGTH:
+            return 0
+        code = 0
+        for position, letter in enumerate(word):
+            number = self.letters.get(letter)
+            if number is None:
+                return 0
+            code |= number << (self.bits * position)
+        return code
+
+    # decode(code) turns a packed code back into its word.
+    def decode(self, code):
+        mask = (1 << self.bits) - 1
+        return "".join(self.alphabet[((code >> (self.bits * position)) & mask) - 1]
+                       for position in range(WORD_LENGTH))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += self.size
+        if not 0 <= number < self.size:
+            raise IndexError("word index out of range")
+        return self.decode(self.codes[number])
+
+    def __iter__(self):
+        return map(self.decode, self.codes)
+
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return False
+        code = self.encode(word)
+        if not code:
+            return False
+        slot = ((code * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.shift
+        while True:
+            found = self.table[slot]
+            if found == code:
+                return True
+            if not found:
+                return False
+            slot = (slot + 1) & (self.table_size - 1)
+
+    # bitset(offset) reads the bitset stored at offset as a Python int,
+    # caching it so repeated filters do not copy it out of the mapping.
+    def bitset(self, offset):
+        bitset = self.bitsets.get(offset)
+        if bitset is None:
+            bitset = int.from_bytes(self.buffer[offset:offset + self.stride], "little")
+            self.bitsets[offset] = bitset
+        return bitset
+
+    # at(position, letter) is the set of words with letter at position.
+    def at(self, position, letter):
+        number = self.letters.get(letter)
+        if number is None:
+            return 0
+        return self.bitset(self.positions + (position * len(self.alphabet) + number - 1) * self.stride)
+
+    # at_least(letter, count) is the set of words containing letter at
+    # least count times.
+    def at_least(self, letter, count):
+        number = self.letters.get(letter)
+        if number is None or count > WORD_LENGTH:
+            return 0
+        if count <= 0:
+            return self.everything
+        return self.bitset(self.counts + ((number - 1) * WORD_LENGTH + count - 1) * self.stride)
+
+    # consistent(history) takes a list of (guess, feedback) pairs and
+    # returns the bitset of words that would have produced exactly that
+    # feedback under evalGuess. An upper-case letter pins the position, a
+    # lower-case letter means the target has more copies of it than were
+    # matched exactly earlier in the guess, and '.' means it has no more.
+    # Letters without case cannot tell the first two apart, so for those
+    # only the constraints that hold either way are applied and the
+    # result is a superset (candidates() checks it against evalGuess).
+    def consistent(self, history):
+        mask = self.everything
+        for guess, feedback in history:
+            exact = {}
+            mark = 0
+            for position, letter in enumerate(guess):
+                here = self.at(position, letter)
+                upper, lower = letter.upper(), letter.lower()
+                if upper == lower:
+                    if feedback.startswith(lower, mark):
+                        mask &= self.at_least(letter, 1)
+                        mark += len(lower)
+                    else:
+                        mask &= ~here
+                        mark += 1
+                elif feedback.startswith(upper, mark):
+                    mask &= here
+                    exact[letter] = exact.get(letter, 0) + 1
+                    mark += len(upper)
+                elif feedback.startswith(lower, mark):
+                    mask &= ~here & self.at_least(letter, exact.get(letter, 0) + 1)
+                    mark += len(lower)
+                else:
+                    mask &= ~here & ~self.at_least(letter, exact.get(letter, 0) + 1)
+                    mark += 1
+        return mask
+
+    # candidates(history) returns the words still possible after the
+    # given (guess, feedback) history, in index order.
+    def candidates(self, history):
+        bits = bin(self.consistent(history))[:1:-1]
+        words = []
+        number = bits.find("1")
+        while number >= 0:
+            words.append(self[number])
+            number = bits.find("1", number + 1)
+        if any(letter.upper() == letter.lower() for guess, feedback in history for letter in guess):
+            words = [word for word in words
+                     if all(evalGuess(guess, word) == feedback for guess, feedback in history)]
+        return words
+
+# loadWordIndex(filename, index) returns a WordIndex for the word list in
+# filename. The compiled index is kept next to the word list (or at
+# index) and is rebuilt only when the word list is newer than it.
+def loadWordIndex(filename='words.dat', index=None):
+    if index is None:
+        index = filename + ".idx"
+    if not os.path.exists(index) or os.path.getmtime(index) < os.path.getmtime(filename):
+        data = WordIndex.build(readWords(filename))
+        temporary = index + ".tmp"
+        with open(temporary, "wb") as outfile:
+            outfile.write(data)
+        os.replace(temporary, index)
+    return WordIndex.open(index)
+
+# Solver constants: feedback patterns are WORD_LENGTH base-3 digits
+# (0 for '.', 1 for a lower-case letter, 2 for an upper-case letter), so
+# every pattern fits in a uint8. SOLVER_CHUNK guesses are scored at once,
+# both when building the feedback matrix and when picking a guess.
+PATTERNS = 3 ** WORD_LENGTH
+SOLVED = PATTERNS - 1
+SOLVER_CACHE = "wordle_cache"
+SOLVER_CHUNK = 256
+
+# feedbackRows(guesses, targets, counts) scores a block of guesses
+# against every target in one go. guesses and targets are arrays of
+# letter ids (one row per word) and counts[t, letter] is how often a
+# letter occurs in target t. It follows evalGuess exactly: a letter is
+# lower-case when the target holds more copies of it than the guess has
+# matched exactly at earlier positions.
+def feedbackRows(guesses, targets, counts):
+    rows = np.zeros((len(guesses), len(targets)), dtype=np.uint8)
+    exact = [guesses[:, position, None] == targets[None, :, position] for position in range(WORD_LENGTH)]
+    for position in range(WORD_LENGTH):
+        letter = guesses[:, position]
+        matched = np.zeros(rows.shape, dtype=np.uint8)
+        for earlier in range(position):
+            matched += exact[earlier] & (guesses[:, earlier] == letter)[:, None]
+        present = ~exact[position] & (counts[:, letter].T > matched)
+        rows += exact[position] * np.uint8(2 * 3 ** position)
+        rows += present * np.uint8(3 ** position)
+    return rows
+
+# patternString(guess, pattern) turns a base-3 pattern back into the
+# feedback string evalGuess would have printed for guess.
+def patternString(guess, pattern):
+    L = []
+    for letter in guess:
+        digit = pattern % 3
+        pattern //= 3
+        if digit == 2:
+            L.append(letter.upper())
+        elif digit == 1:
+            L.append(letter.lower())
+        else:
+            L.append(".")
+    return "".join(L)
+
+# feedbackMatrix(words, cache_dir) returns the guess x target matrix of
+# feedback patterns for a list of 5-letter words. The matrix is written
+# to cache_dir the first time, keyed by a hash of the word list, and
+# memory-mapped from there afterwards.
+def feedbackMatrix(words, cache_dir=SOLVER_CACHE):
+    words = list(words)
+    key = hashlib.blake2b("\n".join(words).encode("utf-8"), digest_size=16).hexdigest()
+    filename = os.path.join(cache_dir, key + ".npy")
+    if os.path.exists(filename):
+        return np.load(filename, mmap_mode="r")
+    os.makedirs(cache_dir, exist_ok=True)
+    letters = {letter: number for number, letter in enumerate(sorted(set("".join(words))))}
+    ids = np.array([[letters[letter] for letter in word] for word in words], dtype=np.intp).reshape(-1, WORD_LENGTH)
+    counts = np.zeros((len(words), len(letters)), dtype=np.uint8)
+    np.add.at(counts, (np.repeat(np.arange(len(words)), WORD_LENGTH), ids.ravel()), 1)
+    temporary = filename + ".tmp.npy"
+    matrix = np.lib.format.open_memmap(temporary, mode="w+", dtype=np.uint8, shape=(len(words), len(words)))
+    for start in range(0, len(words), SOLVER_CHUNK):
+        matrix[start:start + SOLVER_CHUNK] = feedbackRows(ids[start:start + SOLVER_CHUNK], ids, counts)
+    matrix.flush()
+    del matrix
+    os.replace(temporary, filename)
+    return np.load(filename, mmap_mode="r")
+
+# WordleSolver picks guesses by expected information: for every allowed
+# guess it counts how the remaining targets split across feedback
+# patterns and takes the guess with the highest entropy, preferring one
+# that could itself be the answer when there is a tie. Decisions are
+# memoised by the (guess, pattern) path that led to them, so solving many
+# targets reuses the shared part of the decision tree.
+class WordleSolver:
+    def __init__(self, words, cache_dir=SOLVER_CACHE):
+        self.words = [word for word in words if len(word) == WORD_LENGTH]
+        self.matrix = feedbackMatrix(self.words, cache_dir)
+        self.offsets = np.arange(SOLVER_CHUNK)[:, None] * PATTERNS
+        self.choices = {}
+
+    # best(remaining) returns the id of the most informative guess for the
+    # array of remaining target ids. Guesses are scored SOLVER_CHUNK rows
+    # at a time, so the temporaries are SOLVER_CHUNK x len(remaining)
+    # rather than the size of the whole matrix.
+    def best(self, remaining):
+        if len(remaining) <= 2:
+            return int(remaining[0])
+        total = len(remaining)
+        weighted = np.empty(len(self.words))
+        for start in range(0, len(self.words), SOLVER_CHUNK):
+            rows = self.matrix[start:start + SOLVER_CHUNK][:, remaining]
+            flat = rows + self.offsets[:len(rows)]
+            counts = np.bincount(flat.ravel(), minlength=len(rows) * PATTERNS)
+            if total < PATTERNS:
+                # sum(c * log c) over patterns equals sum(log c) over targets
+                weighted[start:start + len(rows)] = np.log2(counts[flat]).sum(axis=1)
+            else:
+                counts = counts.reshape(-1, PATTERNS)
+                weighted[start:start + len(rows)] = (counts * np.log2(np.maximum(counts, 1))).sum(axis=1)
+        entropy = np.log2(total) - weighted / total
+        candidate = np.zeros(len(self.words), dtype=bool)
+        candidate[remaining] = True
+        return int(np.lexsort((candidate, entropy))[-1])
+
+    # solve(target) plays one game against the word with id target and
+    # returns the list of guess ids, ending with the target.
+    def solve(self, target):
+        remaining = np.arange(len(self.words))
+        path = ()
+        guesses = []
+        while True:
+            guess = self.choices.get(path)
+            if guess is None:
+                guess = self.choices[path] = self.best(remaining)
+            guesses.append(guess)
+            pattern = int(self.matrix[guess, target])
+            if pattern == SOLVED:
+                return guesses
+            remaining = remaining[self.matrix[guess, remaining] == pattern]
+            path += ((guess, pattern),)
+
+# solveBlock(words, cache_dir, first, targets) solves a block of target
+# ids and returns the number of guesses each one took. first is the
+# opening guess, computed once by the caller. The solver, and with it the
+# memoised decision tree, is kept per worker process between blocks.
+SOLVERS = {}
+def solveBlock(words, cache_dir, first, targets):
+    solver = SOLVERS.get(cache_dir)
+    if solver is None or solver.words != words:
+        solver = SOLVERS[cache_dir] = WordleSolver(words, cache_dir)
+        solver.choices[()] = first
+    return [len(solver.solve(target)) for target in targets]
+
+# simulate(words, workers, cache_dir) runs the solver against every word
+# in the list, spread over a process pool, and returns a summary with the
+# average and worst-case number of guesses, how many games needed more
+# than six guesses, and the full guess-count histogram. The opening
+# guess is the same for every game, so it is picked once here rather
+# than by every worker.
+def simulate(words, workers=None, cache_dir=SOLVER_CACHE):
+    words = [word for word in words if len(word) == WORD_LENGTH]
+    first = WordleSolver(words, cache_dir).best(np.arange(len(words))) if words else None
+    targets = list(range(len(words)))
+    workers = workers or os.cpu_count() or 1
+    size = max(1, -(-len(targets) // (workers * 4)))
+    blocks = [targets[start:start + size] for start in range(0, len(targets), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        counts = [count for block in pool.map(partial(solveBlock, words, cache_dir, first), blocks) for count in block]
+    return {"words": len(counts),
+            "average": sum(counts) / len(counts) if counts else 0.0,
+            "worst": max(counts, default=0),
+            "failed": sum(count > 6 for count in counts),
+            "histogram": {guesses: counts.count(guesses) for guesses in sorted(set(counts))}}
+
+# wordle(S) takes a list of words (or a WordIndex), S, and randomly
 # selects a target word for this round from S. It then manages game
 # play, and returns True (meaning the user would like to play another
 # round) or False (meaning that the user does not wish to play another
@@ -40,6 +433,7 @@ def wordle(S):
     target=choice(S)       	# Target word to guess
     feedback = '.'*5			# Initial feedback is empty
     history = ""			# String history of word + feedback
+    required = set()			# Letters known to be in the target
     n = 6				# Remaining guesses
 
     # Print opening banner
@@ -75,10 +469,10 @@ def wordle(S):
             # guess.
             print("Unrecognized word: " + str(guess))
 
-        elif str((set(guess)^set(target))&set(target).intersection(feedback.lower())) != "set()":
+        elif required - set(guess):
             # The user's guess does not make use of all the letters
             # that are already known to be in the target word.
-            print("Guess must contain " + str((set(guess)^set(target))&set(target).intersection(feedback.lower())))
+            print("Guess must contain " + str(required - set(guess)))
                 
         else:
 
@@ -88,6 +482,7 @@ def wordle(S):
             history = list(history)
             history.append("\n " + str(7-n) + ": " + guess + " => " + feedback)
             feedback = evalGuess(guess,target)
+            required = set(target).intersection(feedback.lower())
             history = "".join(history)
             n = n-1
             if target == guess:
@@ -101,7 +496,17 @@ def wordle(S):
     return True
 
 if __name__ == '__main__':
-    # Read in the list of legal 5-letter words and then continue
-    # playing the game until wordle() returns False.
-    while wordle(S=readWords('words.dat')):
-        print("Let's play again!\n")
+    parser = argparse.ArgumentParser(description="Play Wordle, or measure the solver against a word list.")
+    parser.add_argument("--words", default="words.dat", help="file of legal 5-letter words")
+    parser.add_argument("--simulate", action="store_true", help="solve every word and report guess counts")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for --simulate")
+    args = parser.parse_args()
+
+    if args.simulate:
+        print(json.dumps(simulate(readWords(args.words), args.workers), indent=2))
+    else:
+        # Load the compiled index of legal 5-letter words once and then
+        # continue playing the game until wordle() returns False.
+        S = loadWordIndex(args.words)
+        while wordle(S):
+            print("Let's play again!\n")
@@ -1,15 +1,247 @@
+import os
+import tracemalloc
+from array import array
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from functools import partial
+from itertools import islice
+from math import factorial, gcd, isqrt
+from operator import truediv
+
+import numpy as np
+
+# Prime engine constants: the sieve works on segments of SEGMENT_SIZE
+# numbers, storing one flag per odd number. The optional on-disk cache
+# covers a contiguous prefix of the integers and is only extended up to
+# PRIME_CACHE_LIMIT (one bit per odd number, so 2**32 takes 256 MiB);
+# primes above that are sieved on demand.
+SEGMENT_SIZE = 1 << 20
+PRIME_CACHE_LIMIT = 1 << 32
+BASE_PRIMES = {}
+
+# basePrimes(n) returns a NumPy array of the odd primes up to n, used to
+# sieve segments. The largest array computed so far is kept and sliced.
+def basePrimes(n):
+    cached = BASE_PRIMES.get("primes")
+    if cached is None or BASE_PRIMES["limit"] < n:
+        flags = np.ones(n // 2 + 1, dtype=bool)
+        flags[0] = False
+        for i in range(1, (isqrt(n) - 1) // 2 + 1):
+            if flags[i]:
+                p = 2 * i + 1
+                flags[p * p // 2::p] = False
+        cached = 2 * np.flatnonzero(flags) + 1
+        cached = cached[cached <= n]
+        BASE_PRIMES.update(primes=cached, limit=n)
+    return cached[:np.searchsorted(cached, n, side="right")]
+
+# sieveSegment(lo, hi) sieves the numbers in [lo, hi), where lo and hi are
+# even, and returns a boolean array with one flag per odd number
+# (flags[i] is True when lo + 2*i + 1 is prime). Each base prime clears
+# its multiples with a single slice assignment.
+def sieveSegment(lo, hi):
+    flags = np.ones((hi - lo) // 2, dtype=bool)
+    for p in basePrimes(isqrt(hi - 1)).tolist():
+        start = max(p * p, -(-lo // p) * p)
+        if start % 2 == 0:
+            start += p
+        flags[(start - lo) // 2::p] = False
+    if lo == 0 and len(flags):
+        flags[0] = False
+    return flags
+
+# segmentPrimes(lo, hi) returns the odd primes in the segment [lo, hi) as
+# a NumPy array, and segmentBits(lo, hi) returns the segment's flags
+# packed eight to a byte; these are what worker processes send back.
+def segmentPrimes(lo, hi):
+    return lo + 1 + 2 * np.flatnonzero(sieveSegment(lo, hi))
+
+def segmentBits(lo, hi):
+    return np.packbits(sieveSegment(lo, hi), bitorder="little")
+
+# mapSegments(function, segments, workers) calls function(lo, hi) for each
+# segment and yields the results in order. With more than one worker the
+# segments are farmed out to a process pool, keeping only a few of them
+# in flight so results do not pile up ahead of the consumer.
+def mapSegments(function, segments, workers=None):
+    workers = workers or os.cpu_count() or 1
+    segments = list(segments)
+    if workers == 1 or len(segments) <= 1:
+        for lo, hi in segments:
+            yield function(lo, hi)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for lo, hi in segments:
+            pending.append(pool.submit(function, lo, hi))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# segmentRange(a, b) splits [a, b) into even-aligned sieve segments.
+def segmentRange(a, b, size=SEGMENT_SIZE):
+    lo = a - a % 2
+    while lo < b:
+        hi = min(lo + size, b + b % 2)
+        yield lo, hi
+        lo = hi
+
+# primeRange(a, b) is a generator that streams the primes p with
+# a <= p < b in increasing order, sieving one segment at a time (in
+# parallel across worker processes) so memory stays bounded for any range.
+def primeRange(a, b, workers=None):
+    """
+    a: Lower bound (inclusive)
+    b: Upper bound (exclusive)
+    workers: Number of worker processes (defaults to the CPU count)
+    """
+    a = max(a, 2)
+    if a >= b:
+        return
+    if a == 2:
+        yield 2
+    for primes in mapSegments(segmentPrimes, segmentRange(a, b), workers):
+        for p in primes.tolist():
+            if a <= p < b:
+                yield p
+
+# primeCount(a, b) returns the number of primes p with a <= p < b,
+# counting each sieved segment in NumPy instead of yielding its primes.
+def primeCount(a, b, workers=None):
+    a = max(a, 2)
+    if a >= b:
+        return 0
+    total = 1 if a == 2 else 0
+    for primes in mapSegments(segmentPrimes, segmentRange(a, b), workers):
+        total += int(np.count_nonzero((primes >= a) & (primes < b)))
+    return total
+
+# PrimeCache keeps a sieve of the integers below self.limit on disk as an
+# odd-only bitset ("bits") plus the running prime count at the end of
+# every segment ("counts.npy"), and extends both as larger queries come
+# in. The bitset is memory-mapped, so queries inside the cached prefix
+# read bits instead of sieving again. The cache lives in the directory
+# the caller names; nothing is written anywhere else.
+class PrimeCache:
+    def __init__(self, directory, workers=None):
+        self.directory = directory
+        self.workers = workers
+        self.bits_path = os.path.join(directory, "bits")
+        self.counts_path = os.path.join(directory, "counts.npy")
+        os.makedirs(directory, exist_ok=True)
+        self.counts = np.load(self.counts_path) if os.path.exists(self.counts_path) else np.zeros(0, dtype=np.int64)
+        with open(self.bits_path, "ab") as outfile:
+            self.counts = self.counts[:outfile.tell() // (SEGMENT_SIZE // 16)]
+            outfile.truncate(len(self.counts) * (SEGMENT_SIZE // 16))
+        self.bits = None
+
+    @property
+    def limit(self):
+        return len(self.counts) * SEGMENT_SIZE
+
+    # extend(n) sieves the segments needed to cover every number below n
+    # (capped at PRIME_CACHE_LIMIT) and appends them to the cache.
+    def extend(self, n):
+        n = min(n, PRIME_CACHE_LIMIT)
+        if n <= self.limit:
+            return
+        total = int(self.counts[-1]) if len(self.counts) else 0
+        segments = segmentRange(self.limit, -(-n // SEGMENT_SIZE) * SEGMENT_SIZE, SEGMENT_SIZE)
+        counts = list(self.counts)
+        with open(self.bits_path, "ab") as outfile:
+            for packed in mapSegments(segmentBits, segments, self.workers):
+                outfile.write(packed.tobytes())
+                total += int(np.unpackbits(packed).sum())
+                counts.append(total)
+        self.counts = np.array(counts, dtype=np.int64)
+        np.save(self.counts_path, self.counts)
+        self.bits = None
+
+    # flags(lo, hi) returns the odd-number flags for [lo, hi), which must
+    # lie inside the cache, with lo and hi even.
+    def flags(self, lo, hi):
+        if self.bits is None or len(self.bits) * 16 < self.limit:
+            self.bits = np.memmap(self.bits_path, dtype=np.uint8, mode="r")
+        first, last = lo // 2, hi // 2
+        packed = self.bits[first // 8:-(-last // 8)]
+        return np.unpackbits(packed, bitorder="little")[first % 8:first % 8 + last - first].astype(bool)
+
+    # primes(a, b) returns the primes p with a <= p < b as a list,
+    # reading the cached part and sieving anything above the cache. Only
+    # prefix queries (starting in the first segment) extend the cache;
+    # narrow or distant ranges are sieved directly.
+    def primes(self, a, b):
+        a = max(a, 2)
+        if a >= b:
+            return []
+        if a < SEGMENT_SIZE:
+            self.extend(b)
+        result = [2] if a == 2 else []
+        lo, hi = a - a % 2, min(b + b % 2, self.limit)
+        if lo < hi:
+            primes = lo + 1 + 2 * np.flatnonzero(self.flags(lo, hi))
+            result.extend(primes[primes < b].tolist())
+        result.extend(primeRange(max(a, hi), b, self.workers))
+        return result
+
+    # count(n) returns the number of primes p <= n using the per-segment
+    # running counts, so only the last partial segment is read.
+    def count(self, n):
+        if n < 2:
+            return 0
+        self.extend(n + 1)
+        bound = min(n + 1, self.limit)
+        segment = bound // SEGMENT_SIZE
+        total = 1 + (int(self.counts[segment - 1]) if segment else 0)
+        lo = segment * SEGMENT_SIZE
+        if lo < bound:
+            total += int(self.flags(lo, bound + bound % 2)[:(bound - lo) // 2].sum())
+        if bound <= n:
+            total += primeCount(bound, n + 1, self.workers)
+        return total
+
+PRIME_CACHES = {}
+
+# primeCache(directory) returns the shared PrimeCache for a directory.
+def primeCache(directory):
+    cache = PRIME_CACHES.get(directory)
+    if cache is None:
+        cache = PRIME_CACHES[directory] = PrimeCache(directory)
+    return cache
+
+# primesBetween(a, b) returns the list of primes p with a <= p < b. The
+# range is sieved directly unless a cache directory is given and b is
+# past the first segment.
+def primesBetween(a, b, directory=None):
+    """
+    a: Lower bound (inclusive)
+    b: Upper bound (exclusive)
+    directory: Directory of the persistent prime cache (None to use no cache)
+    """
+    if directory is None or b <= SEGMENT_SIZE:
+        return list(primeRange(a, b, workers=1 if b <= SEGMENT_SIZE else None))
+    return primeCache(directory).primes(a, b)
+
+# primePi(n) returns the number of primes less than or equal to n.
+def primePi(n, directory=None):
+    """
+    n: Number up to which to count primes
+    directory: Directory of the persistent prime cache (None to use no cache)
+    """
+    if directory is None or n < SEGMENT_SIZE:
+        return primeCount(2, n + 1, workers=1 if n < SEGMENT_SIZE else None)
+    return primeCache(directory).count(n)
 
 # Use the Sieve of Eratosthenes algorithm to find all prime numbers up to n.
 def findPrimeNumbers(n):
     """
     n: Number up to which to find primes
     """
-    sieve = [True] * (n+1)
-    for x in range(2, int(n**0.5) + 1):
-        if sieve[x]:
-            for i in range(x*x, n+1, x):
-                sieve[i] = False
-    return [i for i in range(2,n) if sieve[i]]
+    return primesBetween(2, n)
 
 # Partition a list into chunks of n size.
 def partitionList(lst, n):
@@ -19,6 +251,31 @@ def partitionList(lst, n):
     """
     return [lst[i:i + n] for i in range(0, len(lst), n)]
 
+# iterPartition(lst, n) yields the chunks of partitionList(lst, n) one at
+# a time without building the list of chunks. Buffers (bytes, bytearray,
+# array, memoryview) are chunked as memoryview slices and NumPy arrays as
+# array views, so no data is copied; other sequences (lists, tuples,
+# strings, ranges) yield slices, and everything else, such as dicts, sets
+# and generators, yields lists of up to n items.
+def iterPartition(lst, n):
+    """
+    lst: Sequence, buffer or iterable to be partitioned
+    n: Size of each chunk
+    """
+    if n <= 0:
+        raise ValueError("chunk size must be positive")
+    if isinstance(lst, (bytes, bytearray, memoryview, array)):
+        lst = memoryview(lst)
+    if isinstance(lst, (Sequence, memoryview, np.ndarray)):
+        for i in range(0, len(lst), n):
+            yield lst[i:i + n]
+        return
+    iterator = iter(lst)
+    chunk = list(islice(iterator, n))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, n))
+
 
 # Implement the classic coding challenge 'FizzBuzz'.
 def fizzBuzz(n):
@@ -36,7 +293,257 @@ def permute(lst):
     """
     return list(permutations(lst))
 
-# Implement the 0/1 knapsack problem using dynamic programming.
+# permutationUnrank(rank, n) returns the permutation of range(n) at
+# position rank in lexicographic order (the order itertools.permutations
+# uses), by reading rank in the factorial number system.
+def permutationUnrank(rank, n):
+    """
+    rank: Position of the permutation, from 0 to n! - 1
+    n: Number of elements
+    """
+    if not 0 <= rank < factorial(n):
+        raise ValueError("rank out of range")
+    available = list(range(n))
+    result = []
+    for i in range(n - 1, -1, -1):
+        digit, rank = divmod(rank, factorial(i))
+        result.append(available.pop(digit))
+    return tuple(result)
+
+# permutationRank(perm) is the inverse of permutationUnrank(): it returns
+# the lexicographic position of a permutation of range(n).
+def permutationRank(perm):
+    """
+    perm: Permutation of range(len(perm))
+    """
+    n = len(perm)
+    rank = 0
+    for i, value in enumerate(perm):
+        smaller = sum(1 for later in perm[i + 1:] if later < value)
+        rank += smaller * factorial(n - 1 - i)
+    return rank
+
+# permutationRanges(n, parts) splits the n! permutations of n elements
+# into up to parts contiguous (start, stop) rank ranges of nearly equal
+# size, for handing to iterPermute() in parallel workers.
+def permutationRanges(n, parts):
+    """
+    n: Number of elements
+    parts: Number of ranges wanted
+    """
+    total = factorial(n)
+    parts = max(1, min(parts, total))
+    return [(total * i // parts, total * (i + 1) // parts) for i in range(parts)]
+
+# iterPermute(lst, start, stop) yields the permutations of lst with ranks
+# start..stop-1, in the same order and form as permute(), one at a time.
+# The first is found with permutationUnrank() and each next one by an
+# in-place next-permutation step on the positions.
+def iterPermute(lst, start=0, stop=None):
+    """
+    lst: List of elements to permute
+    start: Rank of the first permutation
+    stop: Rank after the last permutation (defaults to n!)
+    """
+    items = list(lst)
+    n = len(items)
+    stop = factorial(n) if stop is None else min(stop, factorial(n))
+    if start >= stop:
+        return
+    positions = list(permutationUnrank(start, n))
+    for _ in range(stop - start - 1):
+        yield tuple(items[i] for i in positions)
+        i = n - 2
+        while positions[i] > positions[i + 1]:
+            i -= 1
+        j = n - 1
+        while positions[j] < positions[i]:
+            j -= 1
+        positions[i], positions[j] = positions[j], positions[i]
+        positions[i + 1:] = positions[:i:-1]
+    yield tuple(items[i] for i in positions)
+
+# Knapsack constants: instances with up to KNAPSACK_DP_CELLS table cells
+# whose DP row (8 bytes per capacity) fits in KNAPSACK_ROW_BYTES are
+# solved by dynamic programming. Item reconstruction keeps one decision
+# bit per cell while that fits in KNAPSACK_DECISION_BYTES, falling back
+# to divide and conquer (one row at a time) beyond it. Instances with at
+# most KNAPSACK_BB_ITEMS items go to branch and bound, which explores at
+# most 2**KNAPSACK_BB_ITEMS subsets.
+KNAPSACK_DP_CELLS = 2 * 10 ** 9
+KNAPSACK_DECISION_BYTES = 1 << 26
+KNAPSACK_ROW_BYTES = 1 << 28
+KNAPSACK_BB_ITEMS = 20
+
+# valueArray(values, W, exact) picks a NumPy dtype able to hold every sum
+# of the values: int64 for ints whose total fits, float64 for floats,
+# otherwise (mixed or very large values, or any non-int values when exact
+# is set) Python objects, which give the same result types as plain
+# Python arithmetic.
+def valueArray(values, W, exact=False):
+    if all(isinstance(v, int) for v in values) and sum(abs(v) for v in values) < 1 << 62:
+        return np.zeros(W + 1, dtype=np.int64)
+    if not exact and all(isinstance(v, float) for v in values):
+        return np.zeros(W + 1, dtype=np.float64)
+    return np.array([0] * (W + 1), dtype=object)
+
+# knapsackRow(weights, values, W) runs the 0/1 knapsack DP on a single
+# rolling row: for each item the row is updated in one np.maximum over
+# the row shifted by the item's weight, so memory is O(W). row[c] is the
+# best value with capacity c. As in knapsack(), capacity 0 always holds
+# value 0, even when there are zero-weight items.
+def knapsackRow(weights, values, W, exact=False):
+    """
+    weights: List of integer weights of the items
+    values: List of values of the items
+    W: Maximum weight
+    exact: Keep Python number types instead of using float64
+    """
+    row = valueArray(values, W, exact)
+    for w, v in zip(weights, values):
+        if w > W:
+            continue
+        if w:
+            np.maximum(row[w:], row[:W + 1 - w] + v, out=row[w:])
+        else:
+            np.maximum(row[1:], row[1:] + v, out=row[1:])
+    return row
+
+# knapsackDecisions(items, W) solves the DP for a list of (index, weight,
+# value) items while recording, per item, a bit-packed row of which
+# capacities took it, then walks those bits back from capacity W.
+# Returns the chosen item indices.
+def knapsackDecisions(items, W):
+    row = valueArray([v for _, _, v in items], W)
+    decisions = []
+    for _, w, v in items:
+        if w > W:
+            decisions.append(None)
+            continue
+        candidate = row[:W + 1 - w] + v
+        take = candidate > row[w:]
+        np.maximum(row[w:], candidate, out=row[w:])
+        decisions.append(np.packbits(take))
+    chosen = []
+    c = W
+    for (index, w, _), bits in zip(reversed(items), reversed(decisions)):
+        if bits is not None and c >= w and bits[(c - w) >> 3] >> (7 - ((c - w) & 7)) & 1:
+            chosen.append(index)
+            c -= w
+    chosen.reverse()
+    return chosen
+
+# knapsackDivide(items, W) reconstructs the chosen items in O(W) memory,
+# Hirschberg style: the best values of each half of the items are
+# computed for every capacity, the capacity split c maximising
+# left[c] + right[W - c] is found, and each half is solved for its share.
+def knapsackDivide(items, W):
+    if len(items) * (W + 1) <= 8 * KNAPSACK_DECISION_BYTES or len(items) == 1:
+        return knapsackDecisions(items, W)
+    half = len(items) // 2
+    left = knapsackRow([w for _, w, _ in items[:half]], [v for _, _, v in items[:half]], W)
+    right = knapsackRow([w for _, w, _ in items[half:]], [v for _, _, v in items[half:]], W)
+    c = int(np.argmax(left + right[::-1]))
+    return knapsackDivide(items[:half], c) + knapsackDivide(items[half:], W - c)
+
+# knapsackItems(weights, values, W) solves the 0/1 knapsack problem by
+# dynamic programming and returns (best value, list of chosen item
+# indices). Items with zero weight and positive value are always taken.
+def knapsackItems(weights, values, W):
+    """
+    weights: List of integer weights of the items
+    values: List of values of the items
+    W: Maximum weight
+    """
+    free = [i for i, (w, v) in enumerate(zip(weights, values)) if w == 0 and v > 0]
+    items = [(i, w, v) for i, (w, v) in enumerate(zip(weights, values)) if 0 < w <= W and v > 0]
+    chosen = sorted(free + (knapsackDivide(items, W) if items else []))
+    return sum(values[i] for i in chosen), chosen
+
+# knapsackBranchBound(weights, values, W) solves the 0/1 knapsack problem
+# by depth-first branch and bound, for capacities too large for the DP
+# table (weights may be floats). Items are taken in order of value per
+# unit weight, and a branch is dropped when its LP-relaxation bound (fill
+# the rest greedily, then a fraction of the next item) cannot beat the
+# best solution so far. With integer data the ratios are exact fractions
+# and the bound is rounded down. Returns (best value, list of chosen item
+# indices).
+def knapsackBranchBound(weights, values, W):
+    """
+    weights: List of weights of the items
+    values: List of values of the items
+    W: Maximum weight
+    """
+    free = [i for i, (w, v) in enumerate(zip(weights, values)) if w == 0 and v > 0]
+    integral = all(isinstance(x, int) for x in list(weights) + list(values) + [W])
+    ratio = Fraction if integral else truediv
+    order = sorted((i for i, (w, v) in enumerate(zip(weights, values)) if 0 < w <= W and v > 0),
+                   key=lambda i: ratio(values[i], weights[i]), reverse=True)
+    prefix_w, prefix_v = [0], [0]
+    for i in order:
+        prefix_w.append(prefix_w[-1] + weights[i])
+        prefix_v.append(prefix_v[-1] + values[i])
+
+    def bound(k, capacity):
+        j = bisect_right(prefix_w, prefix_w[k] + capacity, k) - 1
+        total = prefix_v[j] - prefix_v[k]
+        if j < len(order):
+            room = (capacity - (prefix_w[j] - prefix_w[k])) * values[order[j]]
+            total += room // weights[order[j]] if integral else room / weights[order[j]]
+        return total
+
+    best, best_chosen = 0, None
+    stack = [(0, W, 0, None)]
+    while stack:
+        k, capacity, value, chosen = stack.pop()
+        if value > best:
+            best, best_chosen = value, chosen
+        if k == len(order) or value + bound(k, capacity) <= best:
+            continue
+        i = order[k]
+        stack.append((k + 1, capacity, value, chosen))
+        if weights[i] <= capacity:
+            stack.append((k + 1, capacity - weights[i], value + values[i], (i, chosen)))
+    chosen = list(free)
+    while best_chosen is not None:
+        chosen.append(best_chosen[0])
+        best_chosen = best_chosen[1]
+    chosen.sort()
+    return sum(values[i] for i in chosen), chosen
+
+# knapsackFitsDP(n, W) says whether the DP for n items and capacity W
+# fits: at most KNAPSACK_DP_CELLS cells and a row of at most
+# KNAPSACK_ROW_BYTES. The decision bits need not fit, since
+# knapsackDivide reconstructs the items without them.
+def knapsackFitsDP(n, W):
+    return n * (W + 1) <= KNAPSACK_DP_CELLS and 8 * (W + 1) <= KNAPSACK_ROW_BYTES
+
+# solveKnapsack(weights, values, W) picks a strategy from n and W and
+# returns (best value, list of chosen item indices). Integer weights are
+# first divided by their common divisor; if there are more than
+# KNAPSACK_BB_ITEMS items and the DP then fits it is solved by DP,
+# otherwise by branch and bound.
+def solveKnapsack(weights, values, W):
+    """
+    weights: List of weights of the items
+    values: List of values of the items
+    W: Maximum weight
+    """
+    if any(w < 0 for w in weights):
+        raise ValueError("knapsack weights must be non-negative")
+    if W < 0:
+        return 0, []
+    if isinstance(W, int) and all(isinstance(w, int) for w in weights):
+        divisor = gcd(*weights)
+        if divisor > 1:
+            weights, W = [w // divisor for w in weights], W // divisor
+        if len(weights) > KNAPSACK_BB_ITEMS and knapsackFitsDP(len(weights), W):
+            return knapsackItems(weights, values, W)
+    return knapsackBranchBound(weights, values, W)
+
+# Implement the 0/1 knapsack problem using dynamic programming. With
+# zero-weight items the DP is kept whenever it fits, for its capacity-0
+# behaviour.
 def knapsack(weights, values, W):
     """
     weights: List of weights of the items
@@ -44,24 +551,27 @@ def knapsack(weights, values, W):
     W: Maximum weight
     """
     n = len(weights)
-    K = [[0 for w in range(W+1)] for i in range(n+1)]
-    for i in range(n+1):
-        for w in range(W+1):
-            if i == 0 or w == 0:
-                K[i][w] = 0
-            elif weights[i-1] <= w:
-                K[i][w] = max(values[i-1] + K[i-1][w-weights[i-1]], K[i-1][w])
-            else:
-                K[i][w] = K[i-1][w]
-    return K[n][W]
+    if W <= 0 or knapsackFitsDP(n, W) and (0 in weights or n > KNAPSACK_BB_ITEMS):
+        best = knapsackRow(weights, values, W, exact=True)[W]
+        return best.item() if isinstance(best, np.generic) else best
+    return solveKnapsack(weights, values, W)[0]
 
 
+# Fuzzy matching constants: strings up to MYERS_LENGTH characters use the
+# bit-parallel distance, and batches of at least FUZZY_BATCH queries are
+# spread over worker processes.
+MYERS_LENGTH = 64
+FUZZY_BATCH = 1000
+
 # Calculate the Levenshtein distance between two strings.
 def levenshteinDistance(s1, s2):
     """
     s1: First string
     s2: Second string
     """
+    if isinstance(s1, str) and isinstance(s2, str):
+        return myersDistance(s1, s2)
+
     if len(s1) < len(s2):
         return levenshteinDistance(s2, s1)
 
@@ -81,6 +591,167 @@ def levenshteinDistance(s1, s2):
     
     return previous_row[-1]
 
+# myersDistance(s1, s2) computes the Levenshtein distance with Myers'
+# bit-parallel algorithm: each column of the DP table is held as bit
+# vectors of vertical +1/-1 deltas in Python ints, so the cost is one
+# handful of integer operations per character of the longer string.
+def myersDistance(s1, s2):
+    """
+    s1: First string
+    s2: Second string
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    m = len(s2)
+    if m == 0:
+        return len(s1)
+    peq = {}
+    for i, c in enumerate(s2):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for c in s1:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score
+
+# boundedDistance(s1, s2, k) returns the Levenshtein distance when it is
+# at most k, and k + 1 otherwise. Strings whose lengths differ by more
+# than k are rejected straight away, short strings use myersDistance(),
+# and longer ones fill only the diagonal band of width 2k + 1, stopping
+# as soon as a whole row exceeds k.
+def boundedDistance(s1, s2, k):
+    """
+    s1: First string
+    s2: Second string
+    k: Largest distance of interest
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    n, m = len(s1), len(s2)
+    if n - m > k:
+        return k + 1
+    if m <= MYERS_LENGTH:
+        return min(myersDistance(s1, s2), k + 1)
+    big = k + 1
+    previous = [j if j <= k else big for j in range(m + 1)]
+    for i in range(1, n + 1):
+        current = [big] * (m + 1)
+        if i <= k:
+            current[0] = i
+        best = current[0]
+        c1 = s1[i - 1]
+        for j in range(max(1, i - k), min(m, i + k) + 1):
+            value = min(previous[j - 1] + (c1 != s2[j - 1]), current[j - 1] + 1, previous[j] + 1, big)
+            current[j] = value
+            if value < best:
+                best = value
+        if best > k:
+            return big
+        previous = current
+    return previous[m]
+
+# FuzzyIndex is a q-gram index over a dictionary of strings for
+# approximate lookups. Each word is split into padded q-grams (a repeated
+# gram is numbered by its occurrence, so counts are multiset counts) with
+# a NumPy posting list of word ids per gram. A word within edit distance
+# k of the query must share at least max(len) + q - 1 - k*q grams with
+# it, so counting postings with np.unique narrows 1M entries down to a
+# few candidates, which are then checked with boundedDistance().
+class FuzzyIndex:
+    def __init__(self, words, q=2):
+        self.q = q
+        self.words = list(words)
+        self.lengths = np.array([len(word) for word in self.words], dtype=np.int64)
+        postings = {}
+        for number, word in enumerate(self.words):
+            for gram in self.grams(word):
+                postings.setdefault(gram, []).append(number)
+        self.postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self.by_length = {}
+        order = np.argsort(self.lengths, kind="stable")
+        lengths, starts = np.unique(self.lengths[order], return_index=True)
+        for length, ids in zip(lengths.tolist(), np.split(order, starts[1:])):
+            self.by_length[length] = ids
+
+    # grams(word) returns the padded q-grams of word, each paired with how
+    # many times it has occurred so far in the word.
+    def grams(self, word):
+        padded = "\0" * (self.q - 1) + word + "\0" * (self.q - 1)
+        seen = {}
+        grams = []
+        for i in range(len(padded) - self.q + 1):
+            gram = padded[i:i + self.q]
+            seen[gram] = seen.get(gram, 0) + 1
+            grams.append((gram, seen[gram]))
+        return grams
+
+    # candidates(query, k) returns the ids of the words that pass the
+    # length and q-gram count filters for distance k.
+    def candidates(self, query, k):
+        size = len(query)
+        lists = [self.postings[gram] for gram in self.grams(query) if gram in self.postings]
+        found = []
+        if lists:
+            ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+            lengths = self.lengths[ids]
+            needed = np.maximum(lengths, size) + self.q - 1 - k * self.q
+            found.append(ids[(np.abs(lengths - size) <= k) & (shared >= needed)])
+        for length in range(max(0, size - k), size + k + 1):
+            if max(length, size) + self.q - 1 - k * self.q <= 0 and length in self.by_length:
+                found.append(self.by_length[length])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    # best_matches(query, k, limit) returns up to limit (word, distance)
+    # pairs within edit distance k of query, closest first (ties in
+    # dictionary order).
+    def best_matches(self, query, k=2, limit=5):
+        matches = []
+        for number in self.candidates(query, k).tolist():
+            distance = boundedDistance(query, self.words[number], k)
+            if distance <= k:
+                matches.append((distance, number))
+        matches.sort()
+        return [(self.words[number], distance) for distance, number in matches[:limit]]
+
+    # best_matches_batch(queries, k, limit, workers) answers many queries
+    # at once, splitting them across a process pool. The index is sent to
+    # each worker once, when the pool starts.
+    def best_matches_batch(self, queries, k=2, limit=5, workers=None):
+        queries = list(queries)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(queries) < FUZZY_BATCH:
+            return [self.best_matches(query, k, limit) for query in queries]
+        size = -(-len(queries) // (workers * 4))
+        blocks = [queries[start:start + size] for start in range(0, len(queries), size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=setFuzzyIndex, initargs=(self,)) as pool:
+            results = pool.map(partial(matchBlock, k=k, limit=limit), blocks)
+            return [matches for block in results for matches in block]
+
+# Worker side of FuzzyIndex.best_matches_batch(): the pool initializer
+# stores the index, and matchBlock() answers one block of queries.
+FUZZY_INDEX = {}
+def setFuzzyIndex(index):
+    FUZZY_INDEX["index"] = index
+
+def matchBlock(queries, k, limit):
+    index = FUZZY_INDEX["index"]
+    return [index.best_matches(query, k, limit) for query in queries]
+
 # findSum(L, min, max) takes a list, L, itself
 # containing lists or tuples of integers, and returns the first
 # element of L whose elements add up to a number between min
@@ -129,6 +800,29 @@ def getDiagonal(matrix):
 def flattenList(L):
     return [item for sublist in L for item in sublist]
 
+# iterFlatten(L, depth) lazily flattens arbitrarily nested iterables,
+# yielding the leaves in order. Strings and bytes count as leaves, and
+# depth limits how many levels are opened (depth=1 matches flattenList()
+# for lists of lists). Uses an explicit stack of iterators, so deep nesting
+# does not hit the recursion limit.
+def iterFlatten(L, depth=None):
+    """
+    L: Iterable, possibly containing nested iterables
+    depth: Optional number of levels to flatten
+    """
+    stack = [iter(L)]
+    while stack:
+        for item in stack[-1]:
+            if not isinstance(item, (str, bytes, bytearray)) and (depth is None or len(stack) <= depth):
+                try:
+                    stack.append(iter(item))
+                    break
+                except TypeError:
+                    pass
+            yield item
+        else:
+            stack.pop()
+
 # numToBinary(n) converts a decimal number to binary
 def numToBinary(n):
     return bin(n).replace("0b", "")
@@ -149,3 +843,29 @@ def capitalizeVowels(string):
 def mergeDicts(d1, d2):
     return {**d1, **d2}
 
+# iteratorMemoryBenchmark(size) measures, with tracemalloc, the peak
+# memory of consuming partitionList, flattenList and permute against their
+# streaming counterparts on inputs scaled by size. Returns a dictionary of
+# peak bytes per function.
+def iteratorMemoryBenchmark(size=1000000):
+    """
+    size: Number of bytes/items in the partition and flatten inputs
+    """
+    def peak(function):
+        tracemalloc.start()
+        try:
+            for _ in function():
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    data = bytearray(size)
+    nested = [list(range(i, i + 100)) for i in range(0, size, 100)]
+    items = list(range(max(2, min(9, size.bit_length() // 2))))
+    return {"partitionList": peak(lambda: partitionList(data, 4096)),
+            "iterPartition": peak(lambda: iterPartition(data, 4096)),
+            "flattenList": peak(lambda: flattenList(nested)),
+            "iterFlatten": peak(lambda: iterFlatten(nested)),
+            "permute": peak(lambda: permute(items)),
+            "iterPermute": peak(lambda: iterPermute(items))}
@@ -0,0 +1,31 @@
+import importlib.machinery
+import importlib.util
+import os
+
+# The script has spaces in its name, so it is loaded by path.
+PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Shopping List Generator.py")
+loader = importlib.machinery.SourceFileLoader("shopping_list_generator", PATH)
+shopping = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+loader.exec_module(shopping)
+
+
+def test_mixed_number_quantity():
+    assert shopping.parse_item("1 1/2 cups flour") == (("flour", "ml"), 360)
+    assert shopping.parse_item("1 1/2 eggs") == (("egg", ""), 1.5)
+    assert shopping.parse_item("flour 1 1/2 cups") == (("flour", "ml"), 360)
+    assert shopping.parse_item("milk 2 1/4") == (("milk", ""), 2.25)
+
+
+def test_name_with_leading_digit():
+    assert shopping.parse_item("7up 2") == (("7up", ""), 2)
+    assert shopping.parse_item("2 cans 7up") == (("7up", "can"), 2)
+
+
+def test_bare_mixed_number():
+    assert shopping.parse_item("2 1/2") == (("2 1/2", ""), 1)
+
+
+def test_plain_quantities():
+    assert shopping.parse_item("1/2 cup milk") == (("milk", "ml"), 120)
+    assert shopping.parse_item("flour 500 g") == (("flour", "g"), 500)
+    assert shopping.parse_item("2 eggs") == (("egg", ""), 2)